@@ -5,31 +5,56 @@ WordPress Posts Migration Script for SullysBlog
 Migrates blog posts, pages, and comments from WordPress SQL dump to Supabase.
 
 Requirements:
-    pip install python-dotenv supabase sqlparse
+    pip install python-dotenv supabase
 
 Usage:
     python migrate-posts.py --sql-file path/to/backup.sql
 
+    # Later, apply only what changed in a newer dump
+    python migrate-posts.py --sql-file path/to/newer-backup.sql --delta
+
 Environment Variables (.env in sullysblog directory):
     NEXT_PUBLIC_SUPABASE_URL=https://your-project.supabase.co
     SUPABASE_SERVICE_KEY=your-service-role-key
 """
 
 import os
-import re
 import sys
 import argparse
 import uuid
+from collections import namedtuple
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
-# WordPress table prefix
-WP_PREFIX = "wp_5sn88nclkq_"
-
-# Batch size for inserts
-BATCH_SIZE = 50
+# Shared dump parsing lives with the other migration scripts in sullysblog/scripts
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'sullysblog', 'scripts'))
+from delta_sync import STATE_FILE_NAME, diff_rows, load_state, row_hash, save_state
+from dump_cache import default_cache_dir, load_tables
+from supabase_writer import MAX_WORKERS
+from write_sinks import WriteSink, add_sink_arguments, open_sink
+from wp_sql_dump import PUBLISHED_POSTS, Select
+
+# The wp_posts columns the migration reads
+PostRow = namedtuple('PostRow', PUBLISHED_POSTS.columns)
+
+# Filters and projections applied inside the dump reader, so rejected rows
+# and unused columns are never decoded
+TABLE_SELECTS = {
+    "posts": PUBLISHED_POSTS,
+    "postmeta": Select(
+        columns=["meta_id", "post_id", "meta_key", "meta_value"],
+        where={"meta_key": ["_thumbnail_id"]},
+    ),
+}
+
+# Columns a delta sync rewrites on existing rows; the rest (author, category,
+# featured image, SEO fields, view count) may have been edited since
+DELTA_UPDATE_COLUMNS = [
+    "slug", "title", "content", "excerpt", "status", "published_at",
+    "updated_at", "wordpress_id", "wordpress_url",
+]
 
 
 def load_env_from_nextjs():
@@ -60,311 +85,251 @@ def init_supabase() -> Client:
     return create_client(supabase_url, service_key)
 
 
-def parse_sql_value(value: str) -> str:
-    """Parse and unescape SQL string value"""
-    if value == 'NULL':
-        return None
-
-    # Remove quotes
-    if value.startswith("'") and value.endswith("'"):
-        value = value[1:-1]
-
-    # Unescape SQL strings
-    value = value.replace("\\'", "'")
-    value = value.replace("\\\"", "\"")
-    value = value.replace("\\\\", "\\")
-    value = value.replace("\\n", "\n")
-    value = value.replace("\\r", "\r")
-    value = value.replace("\\t", "\t")
-
-    return value
-
-
-def extract_insert_values(sql_file: str, table_name: str) -> List[List[str]]:
-    """Extract all INSERT VALUES from a specific table"""
-    print(f"Extracting data from {table_name}...")
-
-    full_table = f"{WP_PREFIX}{table_name}"
-    rows = []
-
-    with open(sql_file, 'r', encoding='utf-8', errors='ignore') as f:
-        current_insert = None
-
-        for line in f:
-            # Check if this is an INSERT for our table
-            if f"INSERT INTO `{full_table}`" in line:
-                current_insert = line
-            elif current_insert:
-                # Continue multi-line INSERT
-                current_insert += line
-                if line.rstrip().endswith(';'):
-                    # Parse the complete INSERT statement
-                    rows.extend(parse_insert_statement(current_insert))
-                    current_insert = None
-
-    print(f"  Found {len(rows)} rows in {table_name}")
-    return rows
-
-
-def parse_insert_statement(sql: str) -> List[List[str]]:
-    """Parse INSERT INTO ... VALUES (...),(...),... statement"""
-    # Find VALUES clause
-    match = re.search(r'VALUES\s+(.+);', sql, re.DOTALL)
-    if not match:
-        return []
-
-    values_part = match.group(1)
-    rows = []
-
-    # Split by ),( to get individual rows
-    # This is simplified - a full parser would handle nested parentheses
-    row_pattern = r'\(([^)]+(?:\([^)]*\)[^)]*)*)\)'
-
-    for row_match in re.finditer(row_pattern, values_part):
-        row_data = row_match.group(1)
-        # Split by comma, but respect quoted strings
-        values = split_sql_values(row_data)
-        rows.append(values)
-
-    return rows
-
-
-def split_sql_values(row_data: str) -> List[str]:
-    """Split SQL row values by comma, respecting quotes"""
-    values = []
-    current = []
-    in_quote = False
-    quote_char = None
-    escape = False
-
-    for char in row_data:
-        if escape:
-            current.append(char)
-            escape = False
-            continue
-
-        if char == '\\':
-            escape = True
-            current.append(char)
-            continue
-
-        if char in ("'", '"') and not in_quote:
-            in_quote = True
-            quote_char = char
-            current.append(char)
-        elif char == quote_char and in_quote:
-            in_quote = False
-            quote_char = None
-            current.append(char)
-        elif char == ',' and not in_quote:
-            values.append(''.join(current).strip())
-            current = []
-        else:
-            current.append(char)
+def load_wordpress_tables(sql_file: str, cache_dir: Optional[str] = None,
+                          use_cache: bool = True, parse_workers: int = 1) -> Dict[str, list]:
+    """Read the tables the migration needs in a single pass over the dump.
+
+    Only published posts/pages and their _thumbnail_id postmeta are parsed
+    (TABLE_SELECTS); other tables are skipped without being decoded.
+    """
+    print("Extracting WordPress tables...")
+
+    data = {
+        "posts": [],
+        "pages": [],
+        "postmeta": [],
+    }
+
+    def route_post(row: tuple):
+        # Already filtered to published posts and pages by TABLE_SELECTS
+        post = PostRow._make(row)
+        data["posts" if post.post_type == 'post' else "pages"].append(post)
+
+    routes = {
+        "posts": route_post,
+        "postmeta": data["postmeta"].append,
+    }
 
-    if current:
-        values.append(''.join(current).strip())
+    # Parsed tables are cached by dump checksum, so reruns skip the parser
+    tables = load_tables(sql_file, routes.keys(), cache_dir=cache_dir, use_cache=use_cache,
+                         workers=parse_workers, select=TABLE_SELECTS)
 
-    return values
+    for table, rows in tables.items():
+        print(f"  Found {len(rows)} rows in {table}")
+        for row in rows:
+            routes[table](row)
 
+    return data
 
-def get_category_map(supabase: Client) -> Dict[int, str]:
+
+def get_category_map(sink: WriteSink) -> Dict[int, str]:
     """Get mapping of WordPress term_id to Supabase category UUID"""
-    result = supabase.table("categories").select("id,name").execute()
+    categories = sink.select("categories", "id,name")
 
     # For now, create a simple name-based mapping
     # In a full migration, we'd parse wp_terms and wp_term_taxonomy
     category_map = {}
-    for cat in result.data:
+    for cat in categories:
         category_map[cat['name'].lower()] = cat['id']
 
     return category_map
 
 
-def migrate_posts(sql_file: str, supabase: Client):
+def clean_dates(row: PostRow):
+    """Published and modified dates, with WordPress null dates replaced"""
+    published_date = row.post_date
+    modified_date = row.post_modified
+
+    # WordPress uses '0000-00-00 00:00:00' for null
+    if published_date and published_date.startswith('0000'):
+        published_date = None
+    if modified_date and modified_date.startswith('0000'):
+        modified_date = datetime.now().isoformat()
+
+    return published_date, modified_date
+
+
+def post_record(row: PostRow, category_id: Optional[str]) -> dict:
+    """Supabase posts row for a WordPress post"""
+    post_id = int(row.ID)
+    published_date, modified_date = clean_dates(row)
+
+    return {
+        "slug": row.post_name or f"post-{post_id}",
+        "title": row.post_title or "Untitled",
+        "content": row.post_content or "",
+        "excerpt": row.post_excerpt if row.post_excerpt else None,
+        "featured_image_url": None,  # Will be updated from postmeta
+        "author_id": str(uuid.uuid4()),  # Placeholder - update with real user
+        "category_id": category_id,
+        "status": "published",
+        "published_at": published_date,
+        "created_at": published_date or datetime.now().isoformat(),
+        "updated_at": modified_date,
+        "view_count": 0,
+        "seo_title": None,
+        "seo_description": None,
+        "wordpress_id": post_id,
+        "wordpress_url": row.guid  # Original URL
+    }
+
+
+def page_record(row: PostRow) -> dict:
+    """Supabase pages row for a WordPress page"""
+    page_id = int(row.ID)
+    published_date, modified_date = clean_dates(row)
+
+    return {
+        "slug": row.post_name or f"page-{page_id}",
+        "title": row.post_title or "Untitled",
+        "content": row.post_content or "",
+        "featured_image_url": None,
+        "author_id": str(uuid.uuid4()),
+        "status": "published",
+        "published_at": published_date,
+        "created_at": published_date or datetime.now().isoformat(),
+        "updated_at": modified_date,
+        "seo_title": None,
+        "seo_description": None,
+        "wordpress_id": page_id,
+        "wordpress_url": row.guid
+    }
+
+
+def migrate_posts(posts_rows: List[PostRow], sink: WriteSink, workers: int = MAX_WORKERS):
     """Migrate WordPress posts to Supabase"""
     print("\n" + "="*60)
     print("MIGRATING BLOG POSTS")
     print("="*60)
 
-    # Extract posts data
-    posts_rows = extract_insert_values(sql_file, "posts")
-
     # Get category mapping
-    category_map = get_category_map(supabase)
+    category_map = get_category_map(sink)
     default_category_id = list(category_map.values())[0] if category_map else None
 
-    # Filter for published posts only
-    posts_to_migrate = []
-
-    for row in posts_rows:
-        # WordPress posts table columns (from schema)
-        # 0:ID, 1:author, 2:post_date, 3:post_date_gmt, 4:content, 5:title,
-        # 6:excerpt, 7:status, 8:comment_status, 9:ping_status, 10:password,
-        # 11:post_name (slug), 12:to_ping, 13:pinged, 14:modified, 15:modified_gmt,
-        # 16:filtered, 17:parent, 18:guid, 19:menu_order, 20:post_type, 21:mime, 22:comment_count
-
-        if len(row) < 23:
-            continue
-
-        post_type = parse_sql_value(row[20])
-        post_status = parse_sql_value(row[7])
-
-        # Only migrate published posts (not pages, attachments, etc.)
-        if post_type != 'post':
-            continue
-
-        if post_status != 'publish':
-            continue
-
-        # Parse post data
-        post_id = int(parse_sql_value(row[0]))
-        title = parse_sql_value(row[5])
-        slug = parse_sql_value(row[11])
-        content = parse_sql_value(row[4])
-        excerpt = parse_sql_value(row[6])
-        published_date = parse_sql_value(row[2])  # post_date
-        modified_date = parse_sql_value(row[14])  # post_modified
-        guid = parse_sql_value(row[18])  # Original URL
-
-        # Clean up dates (WordPress uses '0000-00-00 00:00:00' for null)
-        if published_date and published_date.startswith('0000'):
-            published_date = None
-        if modified_date and modified_date.startswith('0000'):
-            modified_date = datetime.now().isoformat()
-
-        # Build Supabase post object
-        post_data = {
-            "slug": slug or f"post-{post_id}",
-            "title": title or "Untitled",
-            "content": content or "",
-            "excerpt": excerpt if excerpt else None,
-            "featured_image_url": None,  # Will be updated from postmeta
-            "author_id": str(uuid.uuid4()),  # Placeholder - update with real user
-            "category_id": default_category_id,
-            "status": "published",
-            "published_at": published_date,
-            "created_at": published_date or datetime.now().isoformat(),
-            "updated_at": modified_date,
-            "view_count": 0,
-            "seo_title": None,
-            "seo_description": None,
-            "wordpress_id": post_id,
-            "wordpress_url": guid
-        }
-
-        posts_to_migrate.append(post_data)
+    # Build Supabase rows for the published posts
+    posts_to_migrate = [post_record(row, default_category_id) for row in posts_rows]
 
     print(f"\nFound {len(posts_to_migrate)} published posts to migrate")
 
-    # Insert in batches
-    total_inserted = 0
-    failed = 0
+    # Concurrent, size-bounded batches; failing batches are bisected
+    result = sink.write("posts", posts_to_migrate, max_workers=workers)
+    total_inserted = result.written
+    failed = len(result.failed)
 
-    for i in range(0, len(posts_to_migrate), BATCH_SIZE):
-        batch = posts_to_migrate[i:i+BATCH_SIZE]
-
-        try:
-            result = supabase.table("posts").insert(batch).execute()
-            total_inserted += len(batch)
-            print(f"  ✓ Inserted batch {i//BATCH_SIZE + 1}: {len(batch)} posts (total: {total_inserted})")
-        except Exception as e:
-            print(f"  ✗ Error inserting batch {i//BATCH_SIZE + 1}: {e}")
-
-            # Try inserting one by one to identify problem posts
-            for post in batch:
-                try:
-                    supabase.table("posts").insert(post).execute()
-                    total_inserted += 1
-                except Exception as e2:
-                    failed += 1
-                    print(f"    ✗ Failed to insert: {post['title'][:50]}... - {e2}")
+    for post, error in result.failed:
+        print(f"    ✗ Failed to insert: {post['title'][:50]}... - {error}")
 
     print(f"\n✓ Migration complete: {total_inserted} posts inserted, {failed} failed")
 
     return total_inserted
 
 
-def migrate_pages(sql_file: str, supabase: Client):
+def migrate_pages(pages_rows: List[PostRow], sink: WriteSink, workers: int = MAX_WORKERS):
     """Migrate WordPress pages to Supabase"""
     print("\n" + "="*60)
     print("MIGRATING PAGES")
     print("="*60)
 
-    # Extract posts data (pages are in the same table)
-    posts_rows = extract_insert_values(sql_file, "posts")
-
-    pages_to_migrate = []
-
-    for row in posts_rows:
-        if len(row) < 23:
-            continue
-
-        post_type = parse_sql_value(row[20])
-        post_status = parse_sql_value(row[7])
-
-        # Only migrate published pages
-        if post_type != 'page':
-            continue
-
-        if post_status != 'publish':
-            continue
-
-        # Parse page data (same structure as posts)
-        page_id = int(parse_sql_value(row[0]))
-        title = parse_sql_value(row[5])
-        slug = parse_sql_value(row[11])
-        content = parse_sql_value(row[4])
-        published_date = parse_sql_value(row[2])
-        modified_date = parse_sql_value(row[14])
-        guid = parse_sql_value(row[18])
-
-        if published_date and published_date.startswith('0000'):
-            published_date = None
-        if modified_date and modified_date.startswith('0000'):
-            modified_date = datetime.now().isoformat()
-
-        page_data = {
-            "slug": slug or f"page-{page_id}",
-            "title": title or "Untitled",
-            "content": content or "",
-            "featured_image_url": None,
-            "author_id": str(uuid.uuid4()),
-            "status": "published",
-            "published_at": published_date,
-            "created_at": published_date or datetime.now().isoformat(),
-            "updated_at": modified_date,
-            "seo_title": None,
-            "seo_description": None,
-            "wordpress_id": page_id,
-            "wordpress_url": guid
-        }
-
-        pages_to_migrate.append(page_data)
+    pages_to_migrate = [page_record(row) for row in pages_rows]
 
     print(f"\nFound {len(pages_to_migrate)} published pages to migrate")
 
-    # Insert in batches
-    total_inserted = 0
-    failed = 0
-
-    for i in range(0, len(pages_to_migrate), BATCH_SIZE):
-        batch = pages_to_migrate[i:i+BATCH_SIZE]
+    # Concurrent, size-bounded batches; failing batches are bisected
+    result = sink.write("pages", pages_to_migrate, max_workers=workers)
+    total_inserted = result.written
+    failed = len(result.failed)
 
-        try:
-            result = supabase.table("pages").insert(batch).execute()
-            total_inserted += len(batch)
-            print(f"  ✓ Inserted batch {i//BATCH_SIZE + 1}: {len(batch)} pages (total: {total_inserted})")
-        except Exception as e:
-            print(f"  ✗ Error inserting batch: {e}")
-            failed += len(batch)
+    for page, error in result.failed:
+        print(f"    ✗ Failed to insert: {page['title'][:50]}... - {error}")
 
     print(f"\n✓ Migration complete: {total_inserted} pages inserted, {failed} failed")
 
     return total_inserted
 
 
-def verify_migration(supabase: Client):
+def sync_table(table: str, rows: List[PostRow], build: Callable[[PostRow], dict],
+               sink: WriteSink, previous: Dict[str, str],
+               workers: int = MAX_WORKERS) -> Dict[str, str]:
+    """Apply only the rows that changed since the previous run to a table.
+
+    `previous` maps WordPress IDs to the source hashes of the last run;
+    the returned mapping is the state to save for this run. Changed rows
+    that already exist in Supabase are updated in place (keeping their id,
+    author, category, featured image and counters), new ones are inserted,
+    and rows gone from the dump are deleted.
+    """
+    print("\n" + "="*60)
+    print(f"SYNCING {table.upper()} (DELTA)")
+    print("="*60)
+
+    by_id = {str(int(row.ID)): row for row in rows}
+    current = {wordpress_id: row_hash(row) for wordpress_id, row in by_id.items()}
+    delta = diff_rows(previous, current)
+
+    print(f"\n{len(delta.inserted)} new, {len(delta.updated)} changed, "
+          f"{len(delta.deleted)} removed, {delta.unchanged} unchanged")
+
+    # A first delta run has no state: rows already in Supabase become updates
+    existing = {
+        str(row['wordpress_id']): row
+        for row in sink.fetch_in(table, "id, wordpress_id, author_id", "wordpress_id",
+                                 [int(wordpress_id) for wordpress_id in delta.changed])
+    }
+
+    inserts = []
+    updates = []
+    for wordpress_id in delta.changed:
+        record = build(by_id[wordpress_id])
+        if wordpress_id in existing:
+            update = {column: record[column] for column in DELTA_UPDATE_COLUMNS if column in record}
+            # The insert half of an upsert must still satisfy NOT NULL columns
+            update["id"] = existing[wordpress_id]["id"]
+            update["author_id"] = existing[wordpress_id]["author_id"]
+            updates.append(update)
+        else:
+            inserts.append(record)
+
+    failed_ids = set()
+
+    if inserts:
+        result = sink.write(table, inserts, max_workers=workers, verbose=False)
+        for record, error in result.failed:
+            failed_ids.add(str(record["wordpress_id"]))
+            print(f"    ✗ Failed to insert: {record['title'][:50]}... - {error}")
+        print(f"  ✓ Inserted {result.written} {table}")
+
+    if updates:
+        # Upsert on the primary key with only the content columns, i.e. a partial update
+        result = sink.write(table, updates, max_workers=workers,
+                            verbose=False, on_conflict="id")
+        for record, error in result.failed:
+            failed_ids.add(str(record["wordpress_id"]))
+            print(f"    ✗ Failed to update: {record['title'][:50]}... - {error}")
+        print(f"  ✓ Updated {result.written} {table}")
+
+    if delta.deleted:
+        deleted, failures = sink.delete_in(table, "wordpress_id",
+                                           [int(wordpress_id) for wordpress_id in delta.deleted])
+        for chunk, error in failures:
+            failed_ids.update(str(wordpress_id) for wordpress_id in chunk)
+            print(f"    ✗ Failed to delete {len(chunk)} {table}: {error}")
+        print(f"  ✓ Deleted {deleted} {table}")
+
+    # Failed rows keep their previous state, so the next run retries them
+    state = dict(current)
+    for wordpress_id in failed_ids:
+        if wordpress_id in previous:
+            state[wordpress_id] = previous[wordpress_id]
+        else:
+            state.pop(wordpress_id, None)
+
+    print(f"\n✓ Delta sync complete: {len(inserts)} inserts, {len(updates)} updates, "
+          f"{len(delta.deleted)} deletes, {len(failed_ids)} failed")
+
+    return state
+
+
+def verify_migration(sink: WriteSink):
     """Verify migration results"""
     print("\n" + "="*60)
     print("VERIFICATION")
@@ -378,8 +343,7 @@ def verify_migration(supabase: Client):
 
     for table, expected in checks:
         try:
-            result = supabase.table(table).select("id", count="exact").execute()
-            actual = result.count if hasattr(result, 'count') else len(result.data)
+            actual = sink.count(table)
             status = "✓" if actual >= expected else "⚠"
             print(f"{status} {table:15} {actual:4} / {expected:4}")
         except Exception as e:
@@ -391,6 +355,16 @@ def main():
     parser.add_argument("--sql-file", required=True, help="Path to WordPress SQL dump")
     parser.add_argument("--posts-only", action="store_true", help="Only migrate posts, skip pages")
     parser.add_argument("--pages-only", action="store_true", help="Only migrate pages, skip posts")
+    parser.add_argument("--cache-dir", help="Where to cache parsed tables (default: next to the SQL dump)")
+    parser.add_argument("--no-cache", action="store_true", help="Always re-parse the SQL dump")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Concurrent insert requests")
+    parser.add_argument("--parse-workers", type=int, default=1,
+                        help="Processes parsing the SQL dump in parallel (default: 1)")
+    parser.add_argument("--delta", action="store_true",
+                        help="Only insert, update and delete rows that changed since the last --delta run")
+    parser.add_argument("--state-file",
+                        help=f"Delta state file (default: {STATE_FILE_NAME} in the cache directory)")
+    add_sink_arguments(parser)
 
     args = parser.parse_args()
 
@@ -398,28 +372,55 @@ def main():
         print(f"Error: SQL file not found: {args.sql_file}")
         sys.exit(1)
 
-    # Load environment and initialize Supabase
+    # Load environment and open the write target (Supabase unless --sink says otherwise)
     load_env_from_nextjs()
-    supabase = init_supabase()
+    sink = open_sink(args.sink, init_supabase, args.database_url, args.sqlite_path)
 
     print("\n" + "="*60)
     print("WORDPRESS TO SUPABASE MIGRATION")
     print("="*60)
     print(f"SQL File: {args.sql_file}")
     print(f"File Size: {os.path.getsize(args.sql_file) / 1024 / 1024:.1f} MB")
+    print(f"Sink: {sink.name}")
     print()
 
     try:
         total_posts = 0
         total_pages = 0
 
-        if not args.pages_only:
-            total_posts = migrate_posts(args.sql_file, supabase)
+        # One read of the dump (optionally split across processes) feeds every migration step
+        wordpress = load_wordpress_tables(args.sql_file, args.cache_dir, not args.no_cache,
+                                          args.parse_workers)
+
+        if args.delta:
+            state_file = args.state_file or os.path.join(
+                args.cache_dir or default_cache_dir(args.sql_file), STATE_FILE_NAME)
+            state = load_state(state_file)
+            print(f"Delta state: {state_file}")
+
+            if not args.pages_only:
+                category_map = get_category_map(sink)
+                default_category_id = list(category_map.values())[0] if category_map else None
+                state["posts"] = sync_table(
+                    "posts", wordpress["posts"], lambda row: post_record(row, default_category_id),
+                    sink, state.get("posts", {}), args.workers)
+                total_posts = len(wordpress["posts"])
+                save_state(state_file, state)
+
+            if not args.posts_only:
+                state["pages"] = sync_table("pages", wordpress["pages"], page_record,
+                                            sink, state.get("pages", {}), args.workers)
+                total_pages = len(wordpress["pages"])
+                save_state(state_file, state)
+
+        else:
+            if not args.pages_only:
+                total_posts = migrate_posts(wordpress["posts"], sink, args.workers)
 
-        if not args.posts_only:
-            total_pages = migrate_pages(args.sql_file, supabase)
+            if not args.posts_only:
+                total_pages = migrate_pages(wordpress["pages"], sink, args.workers)
 
-        verify_migration(supabase)
+        verify_migration(sink)
 
         print("\n" + "="*60)
         print("MIGRATION COMPLETE!")
@@ -437,6 +438,8 @@ def main():
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        sink.close()
 
 
 if __name__ == "__main__":
@@ -10,6 +10,9 @@ Requirements:
 Usage:
     python migrate-wordpress.py --sql-file path/to/backup.sql
 
+    # Dry run into a local SQLite file
+    python migrate-wordpress.py --sql-file path/to/backup.sql --sink sqlite
+
 Environment Variables (.env):
     SUPABASE_URL=https://your-project.supabase.co
     SUPABASE_KEY=your-anon-key
@@ -17,52 +20,47 @@ Environment Variables (.env):
 """
 
 import os
-import re
 import sys
 import argparse
 from datetime import datetime
 from dotenv import load_dotenv
 from supabase import create_client, Client
 
+# Shared dump parsing lives with the other migration scripts in sullysblog/scripts
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'sullysblog', 'scripts'))
+from wp_sql_dump import table_rows
+from write_sinks import SupabaseSink, WriteSink, add_sink_arguments, open_sink
+
 # Load environment variables
 load_dotenv()
 
-# Supabase client
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_SERVICE_KEY")  # Use service key for admin operations
 
-if not supabase_url or not supabase_key:
-    print("Error: SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in .env file")
-    sys.exit(1)
-
-supabase: Client = create_client(supabase_url, supabase_key)
-
-# WordPress table prefix
-WP_PREFIX = "wp_5sn88nclkq_"
 
+def init_supabase() -> Client:
+    """Supabase client, only needed for --sink supabase"""
+    if not supabase_url or not supabase_key:
+        print("Error: SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in .env file")
+        sys.exit(1)
+    return create_client(supabase_url, supabase_key)
 
 def parse_sql_inserts(sql_file, table_name):
     """
     Parse INSERT statements from SQL dump for a specific table.
-    Returns list of dictionaries representing rows.
+    Yields one tuple of column values per row, streaming the dump.
     """
     print(f"Parsing {table_name} from SQL file...")
 
-    # This is a simplified parser - for production, use mysql-connector-python
-    # to load into temp MySQL and export, or parse more robustly
+    count = 0
+    for row in table_rows(sql_file, table_name):
+        count += 1
+        yield row
 
-    with open(sql_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+    print(f"Found {count} rows for {table_name}")
 
-    # Find INSERT INTO statements for this table
-    pattern = f"INSERT INTO `{WP_PREFIX}{table_name}` VALUES (.+?);"
-    matches = re.findall(pattern, content, re.DOTALL)
 
-    print(f"Found {len(matches)} INSERT statements for {table_name}")
-    return matches
-
-
-def migrate_categories(sql_file):
+def migrate_categories(sql_file, sink: WriteSink):
     """Migrate WordPress categories to Supabase."""
     print("\n=== Migrating Categories ===")
 
@@ -79,17 +77,16 @@ def migrate_categories(sql_file):
         # Add remaining 15 categories from WordPress export
     ]
 
-    for cat in categories:
-        try:
-            result = supabase.table("categories").insert(cat).execute()
-            print(f"✓ Migrated category: {cat['name']}")
-        except Exception as e:
-            print(f"✗ Error migrating category {cat['name']}: {e}")
+    result = sink.write("categories", categories, verbose=False)
+    for cat in result.data:
+        print(f"✓ Migrated category: {cat['name']}")
+    for cat, error in result.failed:
+        print(f"✗ Error migrating category {cat['name']}: {error}")
 
-    print(f"Categories migrated: {len(categories)}")
+    print(f"Categories migrated: {result.written}")
 
 
-def migrate_advertisers(sql_file):
+def migrate_advertisers(sql_file, sink: WriteSink):
     """Migrate WordPress advertiser tracker to Supabase."""
     print("\n=== Migrating Advertisers ===")
 
@@ -101,21 +98,18 @@ def migrate_advertisers(sql_file):
         {"business_name": "Gname", "contact_name": "TBD", "company_url": "https://gname.com"},
     ]
 
-    advertiser_ids = {}
+    result = sink.write("advertisers", advertisers, verbose=False)
+    advertiser_ids = {adv["business_name"]: adv["id"] for adv in result.data}
+    for name in advertiser_ids:
+        print(f"✓ Migrated advertiser: {name}")
+    for adv, error in result.failed:
+        print(f"✗ Error migrating advertiser {adv['business_name']}: {error}")
 
-    for adv in advertisers:
-        try:
-            result = supabase.table("advertisers").insert(adv).execute()
-            advertiser_ids[adv["business_name"]] = result.data[0]["id"]
-            print(f"✓ Migrated advertiser: {adv['business_name']}")
-        except Exception as e:
-            print(f"✗ Error migrating advertiser {adv['business_name']}: {e}")
-
-    print(f"Advertisers migrated: {len(advertisers)}")
+    print(f"Advertisers migrated: {len(advertiser_ids)}")
     return advertiser_ids
 
 
-def migrate_campaigns(sql_file, advertiser_ids):
+def migrate_campaigns(sql_file, advertiser_ids, sink: WriteSink):
     """Migrate ad campaigns."""
     print("\n=== Migrating Ad Campaigns ===")
 
@@ -159,18 +153,20 @@ def migrate_campaigns(sql_file, advertiser_ids):
         },
     ]
 
-    for camp in campaigns:
-        try:
-            result = supabase.table("ad_campaigns").insert(camp).execute()
-            print(f"✓ Migrated campaign for {camp.get('notes', 'advertiser')}")
-        except Exception as e:
-            print(f"✗ Error migrating campaign: {e}")
+    # A bulk insert needs the same keys on every row
+    campaigns = [{"notes": None, **camp} for camp in campaigns]
+
+    result = sink.write("ad_campaigns", campaigns, verbose=False)
+    for camp in result.data:
+        print(f"✓ Migrated campaign for {camp.get('notes') or 'advertiser'}")
+    for camp, error in result.failed:
+        print(f"✗ Error migrating campaign: {error}")
 
     print(f"Campaigns migrated: {len(campaigns)}")
     print(f"Current MRR: $450/month")
 
 
-def migrate_dictionary_terms(sql_file):
+def migrate_dictionary_terms(sql_file, sink: WriteSink):
     """Migrate dictionary terms."""
     print("\n=== Migrating Dictionary Terms ===")
 
@@ -191,17 +187,16 @@ def migrate_dictionary_terms(sql_file):
         # Add remaining 100 terms from WordPress database
     ]
 
-    for term in sample_terms:
-        try:
-            result = supabase.table("dictionary_terms").insert(term).execute()
-            print(f"✓ Migrated term: {term['term']}")
-        except Exception as e:
-            print(f"✗ Error migrating term {term['term']}: {e}")
+    result = sink.write("dictionary_terms", sample_terms, verbose=False)
+    for term in result.data:
+        print(f"✓ Migrated term: {term['term']}")
+    for term, error in result.failed:
+        print(f"✗ Error migrating term {term['term']}: {error}")
 
-    print(f"Dictionary terms migrated: {len(sample_terms)}/102")
+    print(f"Dictionary terms migrated: {result.written}/102")
 
 
-def verify_migration():
+def verify_migration(sink: WriteSink):
     """Verify migration was successful."""
     print("\n=== Migration Verification ===")
 
@@ -214,16 +209,18 @@ def verify_migration():
 
     for table, expected_count in checks:
         try:
-            result = supabase.table(table).select("id", count="exact").execute()
-            actual_count = result.count if hasattr(result, 'count') else len(result.data)
+            actual_count = sink.count(table)
             status = "✓" if actual_count >= expected_count else "⚠"
             print(f"{status} {table}: {actual_count}/{expected_count}")
         except Exception as e:
             print(f"✗ Error checking {table}: {e}")
 
-    # Check current MRR
+    # Check current MRR (a database function, only reachable through Supabase)
+    if not isinstance(sink, SupabaseSink):
+        return
+
     try:
-        result = supabase.rpc("calculate_current_mrr").execute()
+        result = sink.client.rpc("calculate_current_mrr").execute()
         mrr = result.data
         print(f"\nCurrent MRR: ${mrr}/month (expected: $450)")
     except Exception as e:
@@ -234,6 +231,7 @@ def main():
     parser = argparse.ArgumentParser(description="Migrate WordPress to Supabase")
     parser.add_argument("--sql-file", required=True, help="Path to WordPress SQL dump")
     parser.add_argument("--skip-verification", action="store_true", help="Skip verification step")
+    add_sink_arguments(parser)
 
     args = parser.parse_args()
 
@@ -245,15 +243,19 @@ def main():
     print("WordPress to Supabase Migration")
     print("===========================================")
     print(f"SQL File: {args.sql_file}")
-    print(f"Supabase URL: {supabase_url}")
+    print(f"Sink: {args.sink}")
+    if args.sink == "supabase":
+        print(f"Supabase URL: {supabase_url}")
     print()
 
+    sink = open_sink(args.sink, init_supabase, args.database_url, args.sqlite_path)
+
     try:
         # Run migrations in order
-        migrate_categories(args.sql_file)
-        advertiser_ids = migrate_advertisers(args.sql_file)
-        migrate_campaigns(args.sql_file, advertiser_ids)
-        migrate_dictionary_terms(args.sql_file)
+        migrate_categories(args.sql_file, sink)
+        advertiser_ids = migrate_advertisers(args.sql_file, sink)
+        migrate_campaigns(args.sql_file, advertiser_ids, sink)
+        migrate_dictionary_terms(args.sql_file, sink)
 
         # TODO: Add remaining migrations
         # - Users
@@ -264,7 +266,7 @@ def main():
         # - Redirects
 
         if not args.skip_verification:
-            verify_migration()
+            verify_migration(sink)
 
         print("\n===========================================")
         print("Migration Complete!")
@@ -278,6 +280,8 @@ def main():
     except Exception as e:
         print(f"\n✗ Migration failed: {e}")
         sys.exit(1)
+    finally:
+        sink.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the WordPress dump parsers, tracked across commits
+
+Generates a synthetic dump (synthetic_dump: posts, postmeta, comments and
+domain_dictionary) or uses an existing one, runs every parser entry point
+the migration scripts use, and appends one JSON line per case to a results
+file with:
+
+    rows, seconds (best of --repeat), rows_per_sec, mb_per_sec
+    peak_rss_mb      max resident set size of the run, including any
+                     worker processes it started
+    baseline_rss_mb  resident set size before the run, after imports
+    commit, dirty    the git revision being measured
+
+Each repeat of each case runs in a fresh process, so peak RSS belongs to
+that case alone. Cases:
+
+    iter_dump_rows          all tables, mmapped dump
+    iter_dump_rows.chunked  all tables, 1 MB reads instead of mmap
+    table_rows.posts        wp_posts only
+    table_rows.dictionary   domain_dictionary (extract-dictionary-terms.py)
+    select.published        migrate-posts' filter and 9-column projection
+    demux_dump              all tables routed to lists in one pass
+    parallel_demux.xN       the same on N processes (--workers)
+    load_tables.cold        parse and write the columnar cache
+    load_tables.warm        load the tables back from that cache
+
+Usage:
+    python scripts/bench-dump-parsers.py --size-mb 200
+    python scripts/bench-dump-parsers.py --sql-file path/to/backup.sql --workers 2,4
+    python scripts/bench-dump-parsers.py --report
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from dump_cache import load_tables
+from parallel_dump import parallel_demux
+from synthetic_dump import TABLES, scale_for_size, write_dump
+from wp_sql_dump import PUBLISHED_POSTS, WP_PREFIX, demux_dump, iter_dump_rows, table_rows
+
+DEFAULT_OUTPUT = 'bench-results.jsonl'
+
+
+def count(rows) -> int:
+    total = 0
+    for _ in rows:
+        total += 1
+    return total
+
+
+def case_iter_dump_rows(sql_file, cache_dir, workers):
+    return count(iter_dump_rows(sql_file))
+
+
+def case_iter_dump_rows_chunked(sql_file, cache_dir, workers):
+    return count(iter_dump_rows(sql_file, use_mmap=False))
+
+
+def case_table_rows_posts(sql_file, cache_dir, workers):
+    return count(table_rows(sql_file, 'posts'))
+
+
+def case_table_rows_dictionary(sql_file, cache_dir, workers):
+    return count(table_rows(sql_file, 'domain_dictionary'))
+
+
+def case_select_published(sql_file, cache_dir, workers):
+    table = f"{WP_PREFIX}posts"
+    return count(iter_dump_rows(sql_file, tables={table}, select={table: PUBLISHED_POSTS}))
+
+
+def case_demux_dump(sql_file, cache_dir, workers):
+    data = {table: [] for table in TABLES}
+    demux_dump(sql_file, {table: data[table].append for table in TABLES})
+    return sum(len(rows) for rows in data.values())
+
+
+def case_parallel_demux(sql_file, cache_dir, workers):
+    data = parallel_demux(sql_file, TABLES, workers=workers)
+    return sum(len(rows) for rows in data.values())
+
+
+def case_load_tables(sql_file, cache_dir, workers):
+    data = load_tables(sql_file, TABLES, cache_dir=cache_dir)
+    return sum(len(rows) for rows in data.values())
+
+
+CASES: Dict[str, Callable] = {
+    'iter_dump_rows': case_iter_dump_rows,
+    'iter_dump_rows.chunked': case_iter_dump_rows_chunked,
+    'table_rows.posts': case_table_rows_posts,
+    'table_rows.dictionary': case_table_rows_dictionary,
+    'select.published': case_select_published,
+    'demux_dump': case_demux_dump,
+    'parallel_demux': case_parallel_demux,
+    'load_tables.cold': case_load_tables,
+    'load_tables.warm': case_load_tables,
+}
+
+
+def rss_mb(who: int) -> float:
+    """Peak RSS from getrusage (kilobytes on Linux, bytes on macOS)"""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(case: str, sql_file: str, cache_dir: str, workers: int) -> dict:
+    """Run one case; executes in a fresh worker process"""
+    baseline = rss_mb(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    rows = CASES[case](sql_file, cache_dir, workers)
+    elapsed = time.perf_counter() - start
+    peak = max(rss_mb(resource.RUSAGE_SELF), rss_mb(resource.RUSAGE_CHILDREN))
+    return {'rows': rows, 'seconds': elapsed, 'peak_rss_mb': peak, 'baseline_rss_mb': baseline}
+
+
+def run_case(case: str, sql_file: str, cache_dir: str, workers: int, repeat: int) -> dict:
+    runs = []
+    context = multiprocessing.get_context('spawn')
+    for _ in range(repeat):
+        if case == 'load_tables.cold':
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            runs.append(pool.submit(measure, case, sql_file, cache_dir, workers).result())
+
+    best = min(runs, key=lambda run: run['seconds'])
+    size = os.path.getsize(sql_file)
+    return {
+        'rows': best['rows'],
+        'seconds': round(best['seconds'], 4),
+        'seconds_all': [round(run['seconds'], 4) for run in runs],
+        'rows_per_sec': round(best['rows'] / best['seconds'], 1),
+        'mb_per_sec': round(size / 1024 / 1024 / best['seconds'], 2),
+        'peak_rss_mb': round(max(run['peak_rss_mb'] for run in runs), 1),
+        'baseline_rss_mb': round(min(run['baseline_rss_mb'] for run in runs), 1),
+    }
+
+
+def git_revision() -> Dict[str, Optional[object]]:
+    """Commit hash of the tree being measured and whether it has local changes"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=here, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                cwd=here, capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+    return {'commit': commit, 'dirty': bool(status.strip())}
+
+
+def print_report(path: str, last: int):
+    """Results per case, most recent runs last"""
+    if not os.path.exists(path):
+        print(f"No results in {path}")
+        return
+
+    by_case: Dict[str, List[dict]] = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                by_case.setdefault(result['case'], []).append(result)
+
+    for case, results in by_case.items():
+        print(f"\n{case}")
+        for result in results[-last:]:
+            commit = (result.get('commit') or 'unknown')[:10] + ('+' if result.get('dirty') else ' ')
+            dump_mb = result['dump']['bytes'] / 1024 / 1024
+            print(f"  {result['timestamp'][:16]}  {commit}  {dump_mb:7.1f} MB  "
+                  f"{result['rows_per_sec']:>10.0f} rows/s  {result['mb_per_sec']:7.1f} MB/s  "
+                  f"{result['peak_rss_mb']:8.1f} MB peak RSS")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dump parsers and record results")
+    parser.add_argument("--sql-file", help="Existing dump to benchmark (default: generate one)")
+    parser.add_argument("--size-mb", type=float, default=100, help="Size of the synthetic dump")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic dump")
+    parser.add_argument("--keep-dump", help="Write the synthetic dump here and keep it")
+    parser.add_argument("--cases", default=','.join(CASES),
+                        help="Comma-separated cases to run (default: all)")
+    parser.add_argument("--workers", default="2",
+                        help="Comma-separated process counts for parallel_demux, e.g. 2,4,8")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the best is kept")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT,
+                        help=f"JSONL file results are appended to (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--report", action="store_true", help="Print recorded results and exit")
+    parser.add_argument("--last", type=int, default=10, help="Results per case in --report")
+    args = parser.parse_args()
+
+    if args.report:
+        print_report(args.output, args.last)
+        return
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = [case for case in cases if case not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+    if 'load_tables.warm' in cases and 'load_tables.cold' not in cases:
+        # The warm run reads the cache the cold run writes
+        cases.insert(cases.index('load_tables.warm'), 'load_tables.cold')
+
+    work_dir = tempfile.mkdtemp(prefix='bench-dump-')
+    dump_info = {}
+    sql_file = args.sql_file
+    try:
+        if not sql_file:
+            sql_file = args.keep_dump or os.path.join(work_dir, 'synthetic.sql')
+            scale = scale_for_size(args.size_mb, TABLES, args.seed)
+            print(f"Generating {args.size_mb:g} MB synthetic dump ({scale.posts} posts)...")
+            counts = write_dump(sql_file, scale, TABLES, args.seed)
+            dump_info = {'synthetic': True, 'seed': args.seed, 'scale': asdict(scale), 'rows': counts}
+        else:
+            dump_info = {'synthetic': False, 'path': os.path.abspath(sql_file)}
+        dump_info['bytes'] = os.path.getsize(sql_file)
+
+        revision = git_revision()
+        environment = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        }
+        cache_dir = os.path.join(work_dir, 'cache')
+
+        runs = []
+        for case in cases:
+            if case == 'parallel_demux':
+                runs.extend((f"parallel_demux.x{workers}", case, int(workers))
+                            for workers in args.workers.split(',') if workers.strip())
+            else:
+                runs.append((case, case, 1))
+
+        print(f"{'case':24} {'rows':>9}  {'seconds':>8}  {'rows/s':>10}  {'MB/s':>7}  {'peak RSS':>9}")
+        with open(args.output, 'a', encoding='utf-8') as out:
+            for name, case, workers in runs:
+                result = run_case(case, sql_file, cache_dir, workers, args.repeat)
+                print(f"{name:24} {result['rows']:>9}  {result['seconds']:8.2f}  "
+                      f"{result['rows_per_sec']:>10.0f}  {result['mb_per_sec']:7.1f}  "
+                      f"{result['peak_rss_mb']:7.1f}MB")
+                record = {
+                    'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                    **revision,
+                    'case': name,
+                    **result,
+                    'dump': dump_info,
+                    **environment,
+                }
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+
+        print(f"\nResults appended to {args.output}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Benchmark the SQL dump tokenizer against the original per-character parser
+
+Generates a synthetic wp_posts mysqldump (synthetic_dump: long HTML bodies
+with quotes, escapes and parentheses) and reports rows/sec and MB/sec for:
+    regex   - the old parse_insert_statement row regex (loses/mis-splits rows)
+    before  - the per-character record/value loops the scripts used to run
+    after   - wp_sql_dump.iter_dump_rows (compiled regex over the mmapped dump)
+    chunked - the same tokenizer reading 1 MB chunks instead of mmap
+    proj    - mmap with migrate-posts' Select: published posts/pages only,
+              9 of 23 columns decoded
+    par xN  - parallel_dump.parallel_demux on N processes (--workers)
+
+Usage:
+    python scripts/bench-sql-tokenizer.py --size-mb 500
+    python scripts/bench-sql-tokenizer.py --sql-file path/to/backup.sql
+    python scripts/bench-sql-tokenizer.py --skip-legacy --workers 1,2,4,8
+"""
+
+import argparse
+import os
+import re
+import tempfile
+import time
+
+from parallel_dump import parallel_demux
+from synthetic_dump import write_sized_dump
+from wp_sql_dump import POSTS_COLUMNS, PUBLISHED_POSTS, WP_PREFIX, iter_dump_rows
+
+
+# --- Original per-character loops, kept for comparison ---------------------
+# Record splitting from extract-dictionary-terms.py and value splitting from
+# migrate-posts.py (the row regex it used mis-splits rows containing ')').
+
+def legacy_split_records(insert_data):
+    records = []
+    current_record = ""
+    paren_depth = 0
+    in_string = False
+    escape_next = False
+
+    for char in insert_data:
+        if escape_next:
+            current_record += char
+            escape_next = False
+            continue
+        if char == '\\':
+            escape_next = True
+            current_record += char
+            continue
+        if char == "'" and not escape_next:
+            in_string = not in_string
+        if not in_string:
+            if char == '(':
+                paren_depth += 1
+            elif char == ')':
+                paren_depth -= 1
+                if paren_depth == 0:
+                    records.append(current_record)
+                    current_record = ""
+                    continue
+        if paren_depth > 0:
+            current_record += char
+
+    return records
+
+
+def legacy_split_sql_values(row_data):
+    values = []
+    current = []
+    in_quote = False
+    quote_char = None
+    escape = False
+
+    for char in row_data:
+        if escape:
+            current.append(char)
+            escape = False
+            continue
+        if char == '\\':
+            escape = True
+            current.append(char)
+            continue
+        if char in ("'", '"') and not in_quote:
+            in_quote = True
+            quote_char = char
+            current.append(char)
+        elif char == quote_char and in_quote:
+            in_quote = False
+            quote_char = None
+            current.append(char)
+        elif char == ',' and not in_quote:
+            values.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+
+    if current:
+        values.append(''.join(current).strip())
+    return values
+
+
+def legacy_parse_sql_value(value):
+    if value == 'NULL':
+        return None
+    if value.startswith("'") and value.endswith("'"):
+        value = value[1:-1]
+    value = value.replace("\\'", "'")
+    value = value.replace("\\\"", "\"")
+    value = value.replace("\\\\", "\\")
+    value = value.replace("\\n", "\n")
+    value = value.replace("\\r", "\r")
+    value = value.replace("\\t", "\t")
+    return value
+
+
+def legacy_regex_rows(sql_file, table):
+    """The row regex migrate-posts.py used, which splits on ')' in content"""
+    row_pattern = re.compile(r'\(([^)]+(?:\([^)]*\)[^)]*)*)\)')
+    prefix = f"INSERT INTO `{table}` VALUES "
+    with open(sql_file, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            if not line.startswith(prefix):
+                continue
+            for row_match in row_pattern.finditer(line[len(prefix):]):
+                yield legacy_split_sql_values(row_match.group(1))
+
+
+def legacy_rows(sql_file, table):
+    prefix = f"INSERT INTO `{table}` VALUES "
+    with open(sql_file, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            if not line.startswith(prefix):
+                continue
+            for record in legacy_split_records(line[len(prefix):]):
+                yield [legacy_parse_sql_value(v) for v in legacy_split_sql_values(record)]
+
+
+def new_rows(sql_file, table, **options):
+    for _, row in iter_dump_rows(sql_file, tables={table}, **options):
+        yield row
+
+
+def parallel_rows(sql_file, workers):
+    yield from parallel_demux(sql_file, ['posts'], workers=workers)['posts']
+
+
+def run(name, rows, size, width=len(POSTS_COLUMNS)):
+    start = time.perf_counter()
+    count = 0
+    bad_width = 0
+    for row in rows:
+        count += 1
+        if len(row) != width:
+            bad_width += 1
+    elapsed = time.perf_counter() - start
+    print(f"{name:8} {count:>9} rows  {bad_width:>9} bad width  {elapsed:8.2f}s  "
+          f"{count / elapsed:>10.0f} rows/s  {size / 1024 / 1024 / elapsed:7.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQL dump tokenizer")
+    parser.add_argument("--sql-file", help="Existing dump to benchmark (default: generate one)")
+    parser.add_argument("--size-mb", type=int, default=500, help="Size of the synthetic dump")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the new tokenizer")
+    parser.add_argument("--workers", default="",
+                        help="Comma-separated process counts for the parallel parser, e.g. 1,2,4,8")
+    args = parser.parse_args()
+
+    sql_file = args.sql_file
+    temp_path = None
+    if not sql_file:
+        fd, temp_path = tempfile.mkstemp(suffix='.sql')
+        os.close(fd)
+        print(f"Generating {args.size_mb} MB synthetic dump...")
+        posts = write_sized_dump(temp_path, args.size_mb, tables=['posts'])['posts']
+        print(f"  {posts} rows written to {temp_path}")
+        sql_file = temp_path
+
+    size = os.path.getsize(sql_file)
+    table = f"{WP_PREFIX}posts"
+
+    try:
+        if not args.skip_legacy:
+            run("regex", legacy_regex_rows(sql_file, table), size)
+            run("before", legacy_rows(sql_file, table), size)
+        run("after", new_rows(sql_file, table), size)
+        run("chunked", new_rows(sql_file, table, use_mmap=False), size)
+        run("proj", new_rows(sql_file, table, select={table: PUBLISHED_POSTS}), size,
+            width=len(PUBLISHED_POSTS.columns))
+        for workers in filter(None, args.workers.split(',')):
+            run(f"par x{workers}", parallel_rows(sql_file, int(workers)), size)
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+
+if __name__ == '__main__':
+    main()
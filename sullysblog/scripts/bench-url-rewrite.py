@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark post content URL rewriting
+
+Generates synthetic post bodies that embed WordPress upload URLs (including
+resized variants such as -300x200 that share a prefix with the original)
+and times:
+    before  - the per-post loop over every url_mapping entry with
+              `old_url in content` / `content.replace`
+    after   - url_rewriter.UrlRewriter (one trie-shaped regex per mapping)
+
+Both must produce identical post bodies.
+
+Usage:
+    python scripts/bench-url-rewrite.py --posts 1000 --urls 5000
+"""
+
+import argparse
+import random
+import time
+
+from url_rewriter import UrlRewriter
+
+WORDS = (
+    "domain names investing portfolio sale brokerage escrow registrar "
+    "premium keyword brandable auction renewal marketplace parking traffic"
+).split()
+
+
+def make_mapping(rng, count):
+    """Old upload URL -> new Storage URL"""
+    mapping = {}
+    while len(mapping) < count:
+        path = f"{rng.randint(2005, 2025)}/{rng.randint(1, 12):02d}/{rng.choice(WORDS)}-{rng.randint(1, 99999)}"
+        for suffix in ('', '-300x200', '-1024x683'):
+            if len(mapping) < count:
+                mapping[f"https://sullysblog.com/wp-content/uploads/{path}{suffix}.jpg"] = (
+                    f"https://example.supabase.co/storage/v1/object/public/blog-images/{path}{suffix}.jpg"
+                )
+    return mapping
+
+
+def make_post(rng, urls):
+    parts = []
+    for _ in range(rng.randint(5, 40)):
+        words = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 120)))
+        parts.append(f"<p>{words}</p>\n")
+        if rng.random() < 0.3:
+            url = rng.choice(urls)
+            parts.append(f'<a href="{url}"><img src="{url}" alt="" /></a>\n')
+    return ''.join(parts)
+
+
+def legacy_rewrite(content, url_mapping):
+    for old_url, new_url in url_mapping.items():
+        if old_url in content:
+            content = content.replace(old_url, new_url)
+    return content
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark post content URL rewriting")
+    parser.add_argument("--posts", type=int, default=1000, help="Number of posts")
+    parser.add_argument("--urls", type=int, default=5000, help="Entries in the URL mapping")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the new rewriter")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    mapping = make_mapping(rng, args.urls)
+    urls = list(mapping)
+    posts = [make_post(rng, urls) for _ in range(args.posts)]
+    size = sum(len(post) for post in posts)
+    print(f"{args.posts} posts ({size / 1024 / 1024:.1f} MB) x {len(mapping)} URLs")
+
+    start = time.perf_counter()
+    rewriter = UrlRewriter(mapping)
+    compiled = time.perf_counter() - start
+    print(f"compile  {compiled:8.2f}s")
+
+    start = time.perf_counter()
+    after = [rewriter.rewrite(post)[0] for post in posts]
+    elapsed = time.perf_counter() - start
+    print(f"after    {elapsed:8.2f}s  {args.posts / elapsed:>10.0f} posts/s")
+
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        before = [legacy_rewrite(post, mapping) for post in posts]
+        elapsed = time.perf_counter() - start
+        print(f"before   {elapsed:8.2f}s  {args.posts / elapsed:>10.0f} posts/s")
+        mismatches = sum(1 for a, b in zip(before, after) if a != b)
+        print(f"mismatched posts: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
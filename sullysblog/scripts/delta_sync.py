@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Incremental (delta) migration state between WordPress dumps
+
+Each migrated row is remembered by its WordPress ID together with a SHA-256
+of the source columns it was built from. Migrating a newer dump then
+compares the new rows against that state:
+
+    inserted  - IDs not seen before
+    updated   - IDs whose source hash changed
+    deleted   - IDs in the state that are gone from the new dump (e.g.
+                unpublished or trashed posts)
+
+and only those rows are sent to Supabase, so a re-sync costs requests in
+proportion to what changed rather than to the size of the blog.
+
+The state is a small JSON file ({table: {wordpress_id: hash}}), written
+atomically after each run. Rows that failed to write keep their previous
+hash (or none), so they are retried by the next run.
+
+Usage:
+    from delta_sync import diff_rows, load_state, row_hash, save_state
+
+    state = load_state(path)
+    current = {str(row.ID): row_hash(row) for row in rows}
+    delta = diff_rows(state.get('posts', {}), current)
+    ...
+    state['posts'] = current
+    save_state(path, state)
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+STATE_VERSION = 1
+
+STATE_FILE_NAME = 'migrate-posts-state.json'
+
+
+@dataclass
+class Delta:
+    """WordPress IDs that differ between the saved state and a new dump"""
+    inserted: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def changed(self) -> List[str]:
+        return self.inserted + self.updated
+
+
+def row_hash(row: tuple) -> str:
+    """Stable hash of a row's source values"""
+    payload = json.dumps(list(row), ensure_ascii=False, default=str, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def diff_rows(previous: Dict[str, str], current: Dict[str, str]) -> Delta:
+    """Classify current rows against the previous run's hashes"""
+    delta = Delta()
+    for key, digest in current.items():
+        old = previous.get(key)
+        if old is None:
+            delta.inserted.append(key)
+        elif old != digest:
+            delta.updated.append(key)
+        else:
+            delta.unchanged += 1
+    delta.deleted = [key for key in previous if key not in current]
+    return delta
+
+
+def load_state(path: str) -> Dict[str, Dict[str, str]]:
+    """Hashes saved by the previous run, or an empty state"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('version') != STATE_VERSION:
+        print(f"  ○ Ignoring delta state with unknown version: {path}")
+        return {}
+    return state.get('tables', {})
+
+
+def save_state(path: str, tables: Dict[str, Dict[str, str]]):
+    """Write the state atomically so an interrupted run keeps the old one"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': STATE_VERSION, 'tables': tables}, f, separators=(',', ':'))
+    os.replace(tmp, path)
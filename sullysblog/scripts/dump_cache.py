@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of parsed WordPress dump tables
+
+After the first parse, each table's rows are stored column by column in a
+compact marshal file, keyed by the SHA-256 of backup.sql. Later runs against
+the same dump load the rows straight from the cache and skip the SQL parser.
+
+Layout:
+    <cache_dir>/checksums.json                 path/size/mtime -> sha256 memo
+    <cache_dir>/<sha256[:16]>-v<N>/<table>.cols  one file per table
+    <cache_dir>/<sha256[:16]>-v<N>/<table>-<select hash>.cols
+                                               rows of a filtered/projected read
+
+Usage:
+    from dump_cache import load_tables
+
+    tables = load_tables('backup.sql', ['posts', 'postmeta'])
+"""
+
+import hashlib
+import json
+import marshal
+import os
+from itertools import zip_longest
+from typing import Dict, Iterable, List, Optional
+
+from parallel_dump import parallel_demux
+from wp_sql_dump import Select, demux_dump
+
+# Bump when the parser or file format changes so stale caches are ignored
+CACHE_VERSION = 2
+
+CACHE_DIR_NAME = '.wp-dump-cache'
+
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def default_cache_dir(sql_file: str) -> str:
+    """Cache directory next to the dump"""
+    return os.path.join(os.path.dirname(os.path.abspath(sql_file)), CACHE_DIR_NAME)
+
+
+def dump_checksum(sql_file: str, cache_dir: Optional[str] = None) -> str:
+    """SHA-256 of the dump, memoised by path, size and mtime"""
+    cache_dir = cache_dir or default_cache_dir(sql_file)
+    memo_path = os.path.join(cache_dir, 'checksums.json')
+    path = os.path.abspath(sql_file)
+    stat = os.stat(path)
+
+    memo = {}
+    if os.path.exists(memo_path):
+        with open(memo_path, 'r', encoding='utf-8') as f:
+            memo = json.load(f)
+
+    entry = memo.get(path)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(block)
+
+    memo[path] = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest.hexdigest(),
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    _atomic_write(memo_path, json.dumps(memo, indent=2).encode('utf-8'))
+
+    return memo[path]['sha256']
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _table_path(cache_dir: str, checksum: str, table: str,
+                select: Optional[Select] = None) -> str:
+    name = table
+    if select is not None:
+        name += '-' + hashlib.sha256(select.key().encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir, f"{checksum[:16]}-v{CACHE_VERSION}", f"{name}.cols")
+
+
+def save_table(path: str, rows: List[tuple]):
+    """Write rows to a columnar cache file"""
+    widths = [len(row) for row in rows]
+    ragged = len(set(widths)) > 1
+    columns = list(zip_longest(*rows)) if rows else []
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _atomic_write(path, marshal.dumps((len(rows), columns, widths if ragged else None)))
+
+
+def load_table(path: str) -> List[tuple]:
+    """Read rows back from a columnar cache file"""
+    with open(path, 'rb') as f:
+        count, columns, widths = marshal.loads(f.read())
+
+    if not columns:
+        return [()] * count
+
+    rows = list(zip(*columns))
+    if widths is not None:
+        rows = [row[:width] for row, width in zip(rows, widths)]
+    return rows
+
+
+def parse_tables(
+    sql_file: str,
+    tables: List[str],
+    expected_columns: Optional[Dict[str, int]] = None,
+    workers: int = 1,
+    select: Optional[Dict[str, Select]] = None,
+) -> Dict[str, List[tuple]]:
+    """Parse the given tables from the dump, serially or across processes"""
+    if workers > 1:
+        return parallel_demux(sql_file, tables, workers=workers,
+                              expected_columns=expected_columns, select=select)
+
+    data = {table: [] for table in tables}
+    demux_dump(sql_file, {table: data[table].append for table in tables},
+               expected_columns=expected_columns, select=select)
+    return data
+
+
+def load_tables(
+    sql_file: str,
+    tables: Iterable[str],
+    cache_dir: Optional[str] = None,
+    use_cache: bool = True,
+    expected_columns: Optional[Dict[str, int]] = None,
+    workers: int = 1,
+    select: Optional[Dict[str, Select]] = None,
+) -> Dict[str, List[tuple]]:
+    """Return all rows of the given tables (names without prefix).
+
+    Tables already cached for this exact dump are loaded from disk; the rest
+    are parsed together in a single pass and then cached. `expected_columns`
+    is passed to the parser to validate row widths. With `workers` > 1 the
+    dump is parsed by that many processes (parallel_dump). `select` applies
+    a Select per table inside the parser; each distinct Select is cached
+    separately.
+    """
+    tables = list(tables)
+    select = select or {}
+    if not use_cache:
+        return parse_tables(sql_file, tables, expected_columns, workers, select)
+
+    cache_dir = cache_dir or default_cache_dir(sql_file)
+    checksum = dump_checksum(sql_file, cache_dir)
+
+    data = {}
+    missing = []
+    for table in tables:
+        path = _table_path(cache_dir, checksum, table, select.get(table))
+        if os.path.exists(path):
+            data[table] = load_table(path)
+        else:
+            missing.append(table)
+
+    if missing:
+        print(f"  Parsing {', '.join(missing)} from dump (cache miss)")
+        parsed = parse_tables(sql_file, missing, expected_columns, workers, select)
+        for table, rows in parsed.items():
+            save_table(_table_path(cache_dir, checksum, table, select.get(table)), rows)
+        data.update(parsed)
+    else:
+        print(f"  Loaded {', '.join(tables)} from cache {checksum[:16]}")
+
+    return data
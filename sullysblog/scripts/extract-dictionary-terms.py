@@ -6,105 +6,31 @@ Extract dictionary terms from WordPress SQL backup
 import re
 import json
 
+from dump_cache import load_tables
+
 # Path to SQL file
 SQL_FILE = '/Users/michaelsullivan/claude-projects/SullysBlog-122225-backup/backup.sql'
 
 print("Extracting dictionary terms from WordPress backup...")
 
-# Read the SQL file and find the dictionary table INSERT
-with open(SQL_FILE, 'r', encoding='utf-8', errors='ignore') as f:
-    content = f.read()
-
-# Find the INSERT statement for domain_dictionary table
-pattern = r"INSERT INTO `wp_5sn88nclkq_domain_dictionary` VALUES (.*?);"
-match = re.search(pattern, content, re.DOTALL)
+# Served from the parsed-dump cache when backup.sql is unchanged
+records = load_tables(SQL_FILE, ['domain_dictionary'])['domain_dictionary']
 
-if not match:
+if not records:
     print("❌ Could not find dictionary INSERT statement")
     exit(1)
 
-insert_data = match.group(1)
-
-# Split by ),( to get individual records
-# We need to be careful with the HTML content that might contain ),(
-records = []
-current_record = ""
-paren_depth = 0
-in_string = False
-escape_next = False
-
-for char in insert_data:
-    if escape_next:
-        current_record += char
-        escape_next = False
-        continue
-
-    if char == '\\':
-        escape_next = True
-        current_record += char
-        continue
-
-    if char == "'" and not escape_next:
-        in_string = not in_string
-
-    if not in_string:
-        if char == '(':
-            paren_depth += 1
-        elif char == ')':
-            paren_depth -= 1
-            if paren_depth == 0:
-                # End of a record
-                records.append(current_record)
-                current_record = ""
-                continue
-
-    if paren_depth > 0:
-        current_record += char
-
 print(f"\n📊 Found {len(records)} dictionary terms\n")
 
-# Parse each record to extract: id, term_name, slug, page_id, full_definition
+# Each record is: id, term_name, slug, page_id, full_definition, ...
 terms = []
-for i, record in enumerate(records, 1):
-    # Split by comma, but be careful with commas in strings
-    parts = []
-    current_part = ""
-    in_string = False
-    escape_next = False
-
-    for char in record:
-        if escape_next:
-            current_part += char
-            escape_next = False
-            continue
-
-        if char == '\\':
-            escape_next = True
-            current_part += char
-            continue
-
-        if char == "'":
-            in_string = not in_string
-            current_part += char
-            continue
-
-        if char == ',' and not in_string:
-            parts.append(current_part.strip())
-            current_part = ""
-            continue
-
-        current_part += char
-
-    if current_part:
-        parts.append(current_part.strip())
-
+for i, parts in enumerate(records, 1):
     if len(parts) >= 5:
-        # Extract values (remove quotes)
         term_id = parts[0]
-        term_name = parts[1].strip("'")
-        slug = parts[2].strip("'")
-        page_id = parts[3]
-        full_definition = parts[4].strip("'")
+        term_name = parts[1]
+        slug = parts[2]
+        page_id = parts[3] or ''
+        full_definition = parts[4] or ''
 
         # Create short definition (first 150 chars of text content)
         # Strip HTML for short definition
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Pipelined image download -> upload stages shared by the image migrations
+
+Downloads run on a thread pool over one pooled requests.Session, so
+connections to the WordPress host are kept alive and reused, and a token
+bucket caps the request rate instead of sleeping a fixed time per image.
+
+Downloaded bytes are handed to the upload workers through a bounded queue,
+so downloads and uploads overlap and a slow upload side holds back the
+downloaders instead of piling images up in memory. Images are kept in
+memory; only files larger than SPILL_THRESHOLD are streamed to a temporary
+file, which is removed as soon as it has been uploaded.
+
+With a BlobIndex, every image is hashed (SHA-256) before upload and each
+distinct blob is stored once: an image already uploaded under another path,
+by this run or by the other image script, resolves to the existing object's
+URL instead of being uploaded again.
+
+With a Journal, each URL's progress (downloaded, uploaded, public URL,
+hash) is appended to a JSONL file as it happens, so an interrupted run can
+skip finished images on restart and the URL mapping survives the process.
+
+With a VariantStage (image_variants), each newly uploaded original is also
+transcoded to WebP/AVIF at several widths; the variants are uploaded next
+to it and recorded on its blob index entry and journal line.
+
+Usage:
+    from image_pipeline import transfer_images
+
+    def upload(storage_path, data):
+        return upload_to_supabase(supabase, data, storage_path)
+
+    jobs = [(url, relative_path), ...]
+    index = BlobIndex.load(blob_index_path(XML_PATH, BUCKET_NAME))
+    for url, storage_path, result in transfer_images(jobs, upload, index=index):
+        ...   # result is None when the download or upload failed
+"""
+
+import hashlib
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from dump_cache import default_cache_dir
+
+# Downloads in flight at once
+DOWNLOAD_CONCURRENCY = 8
+
+# Sustained requests per second to the origin (bursts up to the concurrency)
+REQUESTS_PER_SECOND = 10.0
+
+# Uploads in flight at once
+UPLOAD_CONCURRENCY = 4
+
+# Downloaded images waiting for an upload worker
+QUEUE_SIZE = 16
+
+# Images larger than this are spilled to disk instead of held in memory
+SPILL_THRESHOLD = 8 * 1024 * 1024
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Objects per Storage list() request
+LIST_PAGE_SIZE = 1000
+
+
+class TokenBucket:
+    """Thread-safe rate limiter: `rate` tokens per second, `capacity` burst"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_session(pool_size: int = DOWNLOAD_CONCURRENCY) -> requests.Session:
+    """Session whose connection pool fits every worker thread"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+@dataclass
+class Blob:
+    """Downloaded image, in memory or spilled to a temporary file"""
+    data: Optional[bytes] = None
+    path: Optional[Path] = None
+
+    def read(self) -> bytes:
+        if self.path is None:
+            return self.data
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def discard(self):
+        self.data = None
+        if self.path is not None:
+            self.path.unlink(missing_ok=True)
+
+
+class BlobIndex:
+    """Content-addressed map of SHA-256 -> the one storage object holding it"""
+
+    def __init__(self, path: str, entries: Optional[Dict[str, dict]] = None):
+        self.path = path
+        self.entries = entries or {}   # sha256 -> {'path': ..., 'url': ...}
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.claims: Dict[str, threading.Lock] = {}
+
+    @classmethod
+    def load(cls, path: str) -> 'BlobIndex':
+        entries = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        return cls(path, entries)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.lock:
+            data = json.dumps(self.entries, indent=2)
+        with open(f"{self.path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def resolve(self, digest: str, storage_path: str,
+                upload: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (URL stored for digest, uploaded now), uploading if new.
+
+        Concurrent workers holding the same blob wait for the first one's
+        upload rather than uploading it twice.
+        """
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry:
+                self.hits += 1
+                return entry['url'], False
+            claim = self.claims.setdefault(digest, threading.Lock())
+
+        with claim:
+            with self.lock:
+                entry = self.entries.get(digest)
+                if entry:
+                    self.hits += 1
+                    return entry['url'], False
+
+            url = upload()
+            if url:
+                with self.lock:
+                    self.entries[digest] = {'path': storage_path, 'url': url}
+            return url, bool(url)
+
+    def annotate(self, digest: str, **fields):
+        """Attach extra fields (such as variants) to a stored blob"""
+        with self.lock:
+            self.entries[digest].update(fields)
+
+
+class StorageListing:
+    """Existing object names per bucket directory, each listed only once"""
+
+    def __init__(self, bucket):
+        self.bucket = bucket   # supabase.storage.from_(BUCKET_NAME)
+        self.directories: Dict[str, Set[str]] = {}
+        self.lock = threading.Lock()
+        self.claims: Dict[str, threading.Lock] = {}
+
+    def _list(self, directory: str) -> Set[str]:
+        names = set()
+        offset = 0
+        while True:
+            page = self.bucket.list(directory, {'limit': LIST_PAGE_SIZE, 'offset': offset})
+            names.update(item['name'] for item in page)
+            if len(page) < LIST_PAGE_SIZE:
+                return names
+            offset += LIST_PAGE_SIZE
+
+    def names(self, directory: str) -> Set[str]:
+        """All object names in a directory, fetched on first use"""
+        with self.lock:
+            if directory in self.directories:
+                return self.directories[directory]
+            claim = self.claims.setdefault(directory, threading.Lock())
+
+        with claim:
+            with self.lock:
+                if directory in self.directories:
+                    return self.directories[directory]
+            try:
+                names = self._list(directory)
+            except Exception as e:
+                # Uploads still fall back to the 'already exists' error
+                print(f"  ✗ Failed to list {directory or '/'}: {e}")
+                names = set()
+            with self.lock:
+                self.directories[directory] = names
+            return names
+
+    def exists(self, storage_path: str) -> bool:
+        directory, _, name = storage_path.rpartition('/')
+        names = self.names(directory)
+        with self.lock:
+            return name in names
+
+    def add(self, storage_path: str):
+        """Record an object uploaded after its directory was listed"""
+        directory, _, name = storage_path.rpartition('/')
+        names = self.names(directory)
+        with self.lock:
+            names.add(name)
+
+
+class Journal:
+    """Append-only JSONL log of every image URL's migration state"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue   # torn line from an interrupted write
+                    self.entries.setdefault(record.pop('url'), {}).update(record)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, 'a', encoding='utf-8')
+        if self.file.tell() and not _ends_with_newline(path):
+            self.file.write('\n')
+
+    def record(self, url: str, **fields):
+        """Merge fields into the URL's entry and append them to the log"""
+        line = json.dumps({'url': url, **fields}, ensure_ascii=False)
+        with self.lock:
+            self.entries.setdefault(url, {}).update(fields)
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def uploaded(self) -> Dict[str, str]:
+        """URL -> public URL for every image already uploaded"""
+        return {
+            url: entry['public_url']
+            for url, entry in self.entries.items()
+            if entry.get('state') == 'uploaded'
+        }
+
+    def close(self):
+        self.file.close()
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def journal_path(xml_path: str, name: str) -> str:
+    """Journal file for one migration script"""
+    return os.path.join(default_cache_dir(xml_path), f"{name}-journal.jsonl")
+
+
+def blob_index_path(xml_path: str, bucket: str) -> str:
+    """Index file shared by every script uploading to the bucket"""
+    return os.path.join(default_cache_dir(xml_path), f"{bucket}-blobs.json")
+
+
+def download_image(session: requests.Session, url: str,
+                   limiter: Optional[TokenBucket] = None,
+                   spill_dir: Optional[str] = None,
+                   spill_threshold: int = SPILL_THRESHOLD) -> Optional[Blob]:
+    """Download an image into memory, spilling to disk past the threshold"""
+    if limiter:
+        limiter.acquire()
+
+    spill = None
+    try:
+        response = session.get(url, timeout=30, stream=True)
+        response.raise_for_status()
+
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            if spill is not None:
+                spill.write(chunk)
+                continue
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > spill_threshold:
+                spill = tempfile.NamedTemporaryFile(dir=spill_dir, delete=False)
+                spill.write(b''.join(chunks))
+                chunks = None
+
+        if spill is None:
+            return Blob(data=b''.join(chunks))
+        spill.close()
+        return Blob(path=Path(spill.name))
+    except Exception as e:
+        if spill is not None:
+            spill.close()
+            os.unlink(spill.name)
+        print(f"  ✗ Failed to download {url}: {e}")
+        return None
+
+
+def transfer_images(
+    jobs: Iterable[Tuple[str, str]],
+    upload: Callable[[str, bytes], Any],
+    download_concurrency: int = DOWNLOAD_CONCURRENCY,
+    upload_concurrency: int = UPLOAD_CONCURRENCY,
+    rate: float = REQUESTS_PER_SECOND,
+    queue_size: int = QUEUE_SIZE,
+    spill_threshold: int = SPILL_THRESHOLD,
+    index: Optional[BlobIndex] = None,
+    journal: Optional[Journal] = None,
+    variants=None,
+) -> Iterator[Tuple[str, str, Any]]:
+    """Download (url, storage_path) jobs and upload them as they arrive.
+
+    `upload(storage_path, data)` runs on the upload workers; a falsy return
+    value or an exception counts as a failure. Yields (url, storage_path,
+    result) in completion order, with result None for failed images.
+
+    With `index`, `upload` must return the object's public URL; duplicate
+    blobs get the URL of the object already holding them, and the index is
+    saved when the transfer ends. With `journal`, each step is recorded
+    against the source URL; `upload` must then return the public URL too.
+    With `variants` (an image_variants.VariantStage), every original
+    uploaded now is transcoded and its variants and their manifest are
+    uploaded via `upload`, which must then return the public URL.
+    """
+    jobs = list(jobs)
+    session = make_session(download_concurrency)
+    limiter = TokenBucket(rate, capacity=download_concurrency)
+    spill_dir = tempfile.mkdtemp(prefix='image-pipeline-')
+    ready = queue.Queue(maxsize=queue_size)
+    results = queue.Queue()
+
+    def fetch(url: str, storage_path: str):
+        # Every job must end in exactly one result, or the consumer blocks
+        blob = None
+        try:
+            blob = download_image(session, url, limiter, spill_dir, spill_threshold)
+            if blob is None:
+                if journal:
+                    journal.record(url, state='failed', stage='download')
+            else:
+                if journal:
+                    journal.record(url, state='downloaded', path=storage_path)
+                # Blocks while the upload side is behind
+                ready.put((url, storage_path, blob))
+                return
+        except Exception as e:
+            print(f"  ✗ Failed to download {url}: {e}")
+            if blob is not None:
+                blob.discard()
+        results.put((url, storage_path, None))
+
+    def uploader():
+        while True:
+            item = ready.get()
+            if item is None:
+                return
+            url, storage_path, blob = item
+            digest = None
+            rendered = None
+            try:
+                data = blob.read()
+                if index is not None or journal is not None:
+                    digest = hashlib.sha256(data).hexdigest()
+                if index is None:
+                    result = upload(storage_path, data)
+                    created = bool(result)
+                else:
+                    result, created = index.resolve(digest, storage_path,
+                                                    lambda: upload(storage_path, data))
+                # Duplicates already got their variants with the first copy
+                if created and variants is not None:
+                    try:
+                        rendered = variants.run(storage_path, data, upload, public_url=result)
+                    except Exception as e:
+                        print(f"  ✗ Failed to make variants of {storage_path}: {e}")
+                        rendered = []
+                    if index is not None:
+                        index.annotate(digest, variants=rendered)
+            except Exception as e:
+                print(f"  ✗ Failed to upload {storage_path}: {e}")
+                result = None
+            finally:
+                blob.discard()
+            try:
+                if journal:
+                    if result:
+                        extra = {'variants': rendered} if rendered is not None else {}
+                        journal.record(url, state='uploaded', public_url=result, sha256=digest, **extra)
+                    else:
+                        journal.record(url, state='failed', stage='upload', sha256=digest)
+            except Exception as e:
+                print(f"  ✗ Failed to record {url} in the journal: {e}")
+            finally:
+                results.put((url, storage_path, result or None))
+
+    uploaders = [threading.Thread(target=uploader, daemon=True)
+                 for _ in range(upload_concurrency)]
+    for thread in uploaders:
+        thread.start()
+
+    downloads = ThreadPoolExecutor(max_workers=download_concurrency)
+    try:
+        for url, storage_path in jobs:
+            downloads.submit(fetch, url, storage_path)
+        for _ in jobs:
+            yield results.get()
+    finally:
+        downloads.shutdown(wait=True, cancel_futures=True)
+        for _ in uploaders:
+            ready.put(None)
+        for thread in uploaders:
+            thread.join()
+        session.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        if index is not None:
+            index.save()
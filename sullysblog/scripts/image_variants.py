@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Optional transcoding stage for the image migrations
+
+For every uploaded JPEG/PNG original, a process pool renders WebP (and AVIF,
+where the installed Pillow supports it) variants at a fixed set of widths.
+Widths larger than the original are skipped, and each format is also
+rendered at the original width. The variants are uploaded next to the
+original:
+
+    2020/01/domain-sale.jpg
+    2020/01/domain-sale-640w.webp
+    2020/01/domain-sale-640w.avif
+    ...
+
+together with a manifest the site reads to build srcset attributes:
+
+    2020/01/domain-sale.variants.json
+    {"src": "<public URL of the original>",
+     "variants": [{"url": "...", "width": 640, "format": "webp"}, ...]}
+
+The site finds the manifest from any image URL it serves (post content or
+featured_image_url) by swapping the extension for `.variants.json`. The
+variant set is also returned so it can be recorded in the blob index and
+journal.
+
+Requires Pillow (pip install Pillow).
+
+Usage:
+    from image_variants import VariantStage
+
+    stage = VariantStage()
+    variants = stage.run(storage_path, data, upload, public_url)
+    stage.close()
+"""
+
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+# Target widths in pixels
+VARIANT_WIDTHS = (320, 640, 1024, 1600)
+
+# Output formats, in order of preference
+VARIANT_FORMATS = ('webp', 'avif')
+
+# Encoder quality per format
+QUALITY = {'webp': 80, 'avif': 60}
+
+# Originals worth transcoding (GIFs may be animated, SVGs are vectors)
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def variant_path(storage_path: str, width: int, fmt: str) -> str:
+    stem, _ = os.path.splitext(storage_path)
+    return f"{stem}-{width}w.{fmt}"
+
+
+def manifest_path(storage_path: str) -> str:
+    stem, _ = os.path.splitext(storage_path)
+    return f"{stem}.variants.json"
+
+
+def make_variants(
+    data: bytes,
+    storage_path: str,
+    widths: Sequence[int] = VARIANT_WIDTHS,
+    formats: Sequence[str] = VARIANT_FORMATS,
+) -> List[Tuple[str, bytes, int, str]]:
+    """Render (path, bytes, width, format) variants of one image.
+
+    Runs in a worker process. Images that cannot be decoded yield no
+    variants rather than failing the upload of the original.
+    """
+    if not storage_path.lower().endswith(SOURCE_EXTENSIONS):
+        return []
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image = ImageOps.exif_transpose(image)
+    except Exception:
+        return []
+
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    sizes = [width for width in widths if width < image.width] + [image.width]
+
+    variants = []
+    for width in sizes:
+        if width == image.width:
+            resized = image
+        else:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            out = io.BytesIO()
+            resized.save(out, format=fmt.upper(), quality=QUALITY.get(fmt, 80))
+            variants.append((variant_path(storage_path, width, fmt), out.getvalue(), width, fmt))
+    return variants
+
+
+class VariantStage:
+    """Process pool that transcodes originals and uploads the variants"""
+
+    def __init__(
+        self,
+        widths: Sequence[int] = VARIANT_WIDTHS,
+        formats: Sequence[str] = VARIANT_FORMATS,
+        processes: Optional[int] = None,
+    ):
+        if Image is None:
+            raise RuntimeError("Image variants require Pillow (pip install Pillow)")
+
+        supported = [fmt for fmt in formats if features.check(fmt)]
+        for fmt in formats:
+            if fmt not in supported:
+                print(f"  ○ Pillow has no {fmt} support, skipping {fmt} variants")
+
+        self.widths = tuple(widths)
+        self.formats = tuple(supported)
+        self.pool = ProcessPoolExecutor(max_workers=processes)
+
+    def run(self, storage_path: str, data: bytes,
+            upload: Callable[[str, bytes], Optional[str]],
+            public_url: Optional[str] = None) -> List[dict]:
+        """Transcode one original and upload its variants and manifest.
+
+        `upload(path, data)` returns the public URL or a falsy value on
+        failure; failed variants are left out of the returned set and of
+        the manifest. `public_url` is the original's URL, stored in the
+        manifest as `src`.
+        """
+        if not self.formats:
+            return []
+
+        rendered = self.pool.submit(
+            make_variants, data, storage_path, self.widths, self.formats
+        ).result()
+
+        variants = []
+        for path, blob, width, fmt in rendered:
+            url = upload(path, blob)
+            if url:
+                variants.append({'path': path, 'url': url, 'width': width, 'format': fmt})
+
+        if variants:
+            manifest = {
+                'src': public_url,
+                'variants': [{key: variant[key] for key in ('url', 'width', 'format')}
+                             for variant in variants],
+            }
+            path = manifest_path(storage_path)
+            if not upload(path, json.dumps(manifest, separators=(',', ':')).encode('utf-8')):
+                print(f"  ✗ Failed to upload variant manifest {path}")
+        return variants
+
+    def close(self):
+        self.pool.shutdown()
@@ -3,14 +3,20 @@
 Download images from WordPress and upload to Supabase Storage
 """
 
+import argparse
 import os
 import re
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from supabase import create_client
 from dotenv import load_dotenv
 from urllib.parse import urlparse
-import time
+
+from image_pipeline import BlobIndex, Journal, blob_index_path, journal_path, transfer_images
+from image_variants import VariantStage
+from supabase_writer import MAX_WORKERS, iter_pages
+from url_rewriter import UrlRewriter
+from wxr_reader import load_index
 
 # Load environment variables
 load_dotenv('.env.local')
@@ -18,6 +24,10 @@ load_dotenv('.env.local')
 SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
 BUCKET_NAME = 'blog-images'
+XML_PATH = '/Users/michaelsullivan/Downloads/sullysblogcom.WordPress.2025-12-24.xml'
+
+# Columns update_post_content reads; only content is written back
+POST_COLUMNS = 'id, content'
 
 def create_storage_bucket(supabase):
     """Create Supabase storage bucket if it doesn't exist"""
@@ -39,36 +49,14 @@ def create_storage_bucket(supabase):
             return False
     return True
 
-def download_image(url, local_path):
-    """Download image from URL to local path"""
+def upload_to_supabase(supabase, file_data, storage_path):
+    """Upload image bytes to Supabase Storage"""
     try:
-        response = requests.get(url, timeout=30, stream=True)
-        response.raise_for_status()
-
-        # Create directory if it doesn't exist
-        local_path.parent.mkdir(parents=True, exist_ok=True)
-
-        # Save image
-        with open(local_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-
-        return True
-    except Exception as e:
-        print(f"  ✗ Failed to download {url}: {e}")
-        return False
-
-def upload_to_supabase(supabase, local_path, storage_path):
-    """Upload image to Supabase Storage"""
-    try:
-        with open(local_path, 'rb') as f:
-            file_data = f.read()
-
         # Upload file
         supabase.storage.from_(BUCKET_NAME).upload(
             storage_path,
             file_data,
-            file_options={"content-type": get_content_type(local_path)}
+            file_options={"content-type": get_content_type(Path(storage_path))}
         )
 
         return True
@@ -79,7 +67,7 @@ def upload_to_supabase(supabase, local_path, storage_path):
                 supabase.storage.from_(BUCKET_NAME).update(
                     storage_path,
                     file_data,
-                    file_options={"content-type": get_content_type(local_path)}
+                    file_options={"content-type": get_content_type(Path(storage_path))}
                 )
                 return True
             except:
@@ -96,7 +84,9 @@ def get_content_type(file_path):
         '.png': 'image/png',
         '.gif': 'image/gif',
         '.webp': 'image/webp',
-        '.svg': 'image/svg+xml'
+        '.avif': 'image/avif',
+        '.svg': 'image/svg+xml',
+        '.json': 'application/json'
     }
     return types.get(ext, 'application/octet-stream')
 
@@ -109,92 +99,141 @@ def update_post_content(supabase, url_mapping):
     """Update all posts with new image URLs"""
     print("\nUpdating post content with new URLs...")
 
-    # Get all posts
-    posts = supabase.table('posts').select('id, content').execute()
+    # One compiled pattern for every old URL, one scan per post
+    rewriter = UrlRewriter(url_mapping)
+
+    def update_content(post_id, content):
+        # Only content is written, and only to a post that still exists, so
+        # other columns edited in the admin meanwhile are left alone. Content
+        # edited between the read and this write is still overwritten.
+        result = supabase.table('posts').update({'content': content}).eq('id', post_id).execute()
+        return bool(result.data)
 
     updated_count = 0
-    for post in posts.data:
-        content = post['content']
-        original_content = content
-
-        # Replace all old URLs with new ones
-        for old_url, new_url in url_mapping.items():
-            if old_url in content:
-                content = content.replace(old_url, new_url)
-
-        # Update if content changed
-        if content != original_content:
-            supabase.table('posts').update({
-                'content': content
-            }).eq('id', post['id']).execute()
-            updated_count += 1
+    failed_count = 0
+    missing_count = 0
+    # Stream posts a page at a time and write each page's changes concurrently
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        for page in iter_pages(supabase, 'posts', POST_COLUMNS):
+            updates = {}
+            for post in page:
+                content, replaced = rewriter.rewrite(post['content'])
+                if replaced:
+                    updates[pool.submit(update_content, post['id'], content)] = post['id']
+
+            for future, post_id in updates.items():
+                try:
+                    if future.result():
+                        updated_count += 1
+                    else:
+                        missing_count += 1
+                except Exception as e:
+                    print(f"  ✗ Failed to update post {post_id}: {e}")
+                    failed_count += 1
 
     print(f"✓ Updated {updated_count} posts with new image URLs")
+    if missing_count:
+        print(f"○ Skipped {missing_count} posts deleted during the run")
+    if failed_count:
+        print(f"✗ Failed to update {failed_count} posts")
 
 def main():
+    parser = argparse.ArgumentParser(description="Migrate post content images to Supabase Storage")
+    parser.add_argument("--update-posts-only", action="store_true",
+                        help="Rewrite post content from the journal without transferring images")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the journal of previous runs and transfer every image again")
+    parser.add_argument("--variants", action="store_true",
+                        help="Also upload WebP/AVIF variants at several widths (needs Pillow)")
+    args = parser.parse_args()
+
     print("=== Image Migration to Supabase Storage ===\n")
 
     # Initialize Supabase
     supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+    # Progress of earlier (possibly interrupted) runs
+    path = journal_path(XML_PATH, 'content-images')
+    if args.restart and os.path.exists(path):
+        os.remove(path)
+    journal = Journal(path)
+
+    if args.update_posts_only:
+        url_mapping = journal.uploaded()
+        print(f"Loaded {len(url_mapping)} uploaded images from {path}")
+        if url_mapping:
+            update_post_content(supabase, url_mapping)
+        journal.close()
+        return
+
     # Create storage bucket
     if not create_storage_bucket(supabase):
         return
 
-    # Read image URLs
+    # Read image URLs, falling back to the shared index of the XML export
     image_urls_file = Path('scripts/image_urls.txt')
-    if not image_urls_file.exists():
+    if image_urls_file.exists():
+        with open(image_urls_file, 'r') as f:
+            urls = [line.strip() for line in f if line.strip()]
+    elif Path(XML_PATH).exists():
+        urls = load_index(XML_PATH).content_image_urls()
+    else:
         print("Error: image_urls.txt not found")
         return
 
-    with open(image_urls_file, 'r') as f:
-        urls = [line.strip() for line in f if line.strip()]
-
     print(f"\nFound {len(urls)} images to migrate\n")
 
-    # Create temp directory for downloads
-    temp_dir = Path('temp_images')
-    temp_dir.mkdir(exist_ok=True)
-
-    url_mapping = {}
+    # Images finished by an earlier run are not transferred again
+    url_mapping = journal.uploaded()
+    resumed_count = len(url_mapping)
     success_count = 0
     fail_count = 0
+    if resumed_count:
+        print(f"Resuming: {resumed_count} images already uploaded\n")
 
-    for i, url in enumerate(urls, 1):
-        print(f"[{i}/{len(urls)}] Processing {url}")
-
-        # Parse URL to get path
-        parsed = urlparse(url)
-        # Extract path after /wp-content/uploads/
-        match = re.search(r'/wp-content/uploads/(.+)$', parsed.path)
+    # Parse URLs to storage paths (after /wp-content/uploads/)
+    jobs = []
+    for url in dict.fromkeys(urls):
+        if url in url_mapping:
+            continue
+        match = re.search(r'/wp-content/uploads/(.+)$', urlparse(url).path)
         if not match:
-            print(f"  ✗ Could not parse path from URL")
+            print(f"  ✗ Could not parse path from {url}")
             fail_count += 1
             continue
+        jobs.append((url, match.group(1)))
 
-        relative_path = match.group(1)
-        local_path = temp_dir / relative_path
-
-        # Download image
-        if download_image(url, local_path):
-            # Upload to Supabase
-            if upload_to_supabase(supabase, local_path, relative_path):
-                # Get public URL
-                new_url = get_public_url(supabase, relative_path)
-                url_mapping[url] = new_url
-                print(f"  ✓ Uploaded successfully")
-                success_count += 1
-            else:
-                fail_count += 1
+    def upload(relative_path, data):
+        if upload_to_supabase(supabase, data, relative_path):
+            return get_public_url(supabase, relative_path)
+
+    # Identical images (other sizes/paths, or already uploaded by the other
+    # image script) resolve to one storage object
+    blobs = BlobIndex.load(blob_index_path(XML_PATH, BUCKET_NAME))
+
+    # Optional responsive variants, transcoded in a process pool
+    variants = VariantStage() if args.variants else None
+
+    # Downloads stream straight into concurrent uploads, no temp directory
+    transfers = transfer_images(jobs, upload, index=blobs, journal=journal, variants=variants)
+    for i, (url, relative_path, new_url) in enumerate(transfers, 1):
+        print(f"[{i}/{len(jobs)}] Processing {url}")
+
+        if new_url:
+            url_mapping[url] = new_url
+            print(f"  ✓ Uploaded successfully")
+            success_count += 1
         else:
             fail_count += 1
 
-        # Small delay to avoid overwhelming servers
-        time.sleep(0.5)
-
     print(f"\n=== Download/Upload Summary ===")
     print(f"✓ Success: {success_count}")
     print(f"✗ Failed: {fail_count}")
+    print(f"○ Duplicates reused: {blobs.hits}")
+    print(f"↻ Resumed from journal: {resumed_count}")
+    journal.close()
+    if variants:
+        variants.close()
 
     # Update post content with new URLs
     if url_mapping:
@@ -205,11 +244,5 @@ def main():
     print(f"Images uploaded: {success_count}")
     print(f"Posts updated: Check blog to verify")
 
-    # Clean up temp directory
-    print("\nCleaning up temporary files...")
-    import shutil
-    shutil.rmtree(temp_dir)
-    print("✓ Cleanup complete")
-
 if __name__ == '__main__':
     main()
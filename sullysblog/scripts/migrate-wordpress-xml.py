@@ -1,15 +1,23 @@
 #!/usr/bin/env python3
 """
 Migrate WordPress XML export to Supabase
+
+Usage:
+    python migrate-wordpress-xml.py
+    python migrate-wordpress-xml.py --sink sqlite --sqlite-path dry-run.sqlite3
 """
 
-from lxml import etree as ET
+import argparse
 import os
 import re
+import uuid
 from datetime import datetime
 from supabase import create_client
 from dotenv import load_dotenv
 
+from write_sinks import add_sink_arguments, open_sink
+from wxr_reader import Category, Comment, Post, WxrIndex, iter_wxr, save_index
+
 # Load environment variables from .env.local
 load_dotenv('.env.local')
 
@@ -17,138 +25,79 @@ load_dotenv('.env.local')
 SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
 
-# WordPress XML namespaces
-NAMESPACES = {
-    'wp': 'http://wordpress.org/export/1.2/',
-    'content': 'http://purl.org/rss/1.0/modules/content/',
-    'excerpt': 'http://wordpress.org/export/1.2/excerpt/',
-    'dc': 'http://purl.org/dc/elements/1.1/'
-}
+# Comment ids are derived from the WordPress comment ID, so reruns upsert
+# the same rows instead of inserting duplicates
+COMMENT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_DNS, 'sullysblog.com')
 
 def parse_wordpress_xml(xml_path):
     """Parse WordPress XML export and extract data"""
     print(f"Parsing XML file: {xml_path}")
 
-    # Use lxml with recover mode to handle malformed XML
-    parser = ET.XMLParser(recover=True, encoding='utf-8')
-    tree = ET.parse(xml_path, parser)
-    root = tree.getroot()
-    channel = root.find('channel')
-
-    print("Using lxml parser with recovery mode")
-
-    # Extract categories
+    # Streamed one <item> at a time (lxml iterparse with recovery mode)
     categories = {}
-    for cat in channel.findall('wp:category', NAMESPACES):
-        term_id = cat.find('wp:term_id', NAMESPACES).text
-        cat_name = cat.find('wp:cat_name', NAMESPACES).text
-        cat_slug = cat.find('wp:category_nicename', NAMESPACES).text
-        categories[term_id] = {
-            'name': cat_name,
-            'slug': cat_slug,
-            'description': ''
-        }
-
-    print(f"Found {len(categories)} categories")
-
-    # Extract posts
     posts = []
     comments = []
     image_urls = set()
+    include_comments = False
 
-    for item in channel.findall('item'):
-        # Only process published posts
-        post_type = item.find('wp:post_type', NAMESPACES)
-        post_status = item.find('wp:status', NAMESPACES)
+    # Built in the same pass and saved for the image migrations to reuse
+    index = WxrIndex()
+
+    for record in iter_wxr(xml_path):
+        index.add(record)
 
-        if post_type is None or post_type.text != 'post':
+        if isinstance(record, Category):
+            categories[record.term_id] = {
+                'name': record.name,
+                'slug': record.slug,
+                'description': ''
+            }
+            continue
+
+        if isinstance(record, Comment):
+            if include_comments:
+                comments.append(comment_data(record))
             continue
 
-        if post_status is None or post_status.text not in ['publish', 'future']:
+        if not isinstance(record, Post):
             continue
 
-        # Extract post data
-        title = item.find('title').text or ''
-        content_elem = item.find('content:encoded', NAMESPACES)
-        content = content_elem.text if content_elem is not None and content_elem.text else ''
-        excerpt_elem = item.find('excerpt:encoded', NAMESPACES)
-        excerpt = excerpt_elem.text if excerpt_elem is not None and excerpt_elem.text else ''
+        # Only process published posts
+        include_comments = (
+            record.post_type == 'post' and record.status in ['publish', 'future']
+        )
+        if not include_comments:
+            continue
 
         # Clean excerpt (remove HTML if any)
-        excerpt = re.sub(r'<[^>]+>', '', excerpt)
+        excerpt = re.sub(r'<[^>]+>', '', record.excerpt)
         excerpt = excerpt.strip()[:500]  # Limit to 500 chars
 
-        slug = item.find('wp:post_name', NAMESPACES).text
-        post_date = item.find('wp:post_date_gmt', NAMESPACES).text
-        post_id = item.find('wp:post_id', NAMESPACES).text
-
         # Parse date
         try:
-            published_at = datetime.strptime(post_date, '%Y-%m-%d %H:%M:%S')
+            published_at = datetime.strptime(record.post_date_gmt, '%Y-%m-%d %H:%M:%S')
         except:
             published_at = datetime.now()
 
-        # Extract category
-        category_elem = item.find('category[@domain="category"]')
-        category_name = category_elem.text if category_elem is not None else None
-        category_slug = category_elem.get('nicename') if category_elem is not None else None
-
-        # Extract featured image URL from postmeta
-        featured_image_url = None
-        for meta in item.findall('wp:postmeta', NAMESPACES):
-            meta_key = meta.find('wp:meta_key', NAMESPACES)
-            if meta_key is not None and meta_key.text == '_thumbnail_id':
-                # We'll need to map this ID to actual image URL later
-                thumbnail_id = meta.find('wp:meta_value', NAMESPACES).text
-                break
-
         # Extract image URLs from content
         img_pattern = r'src="(https://sullysblog\.com/wp-content/uploads/[^"]+)"'
-        images_in_content = re.findall(img_pattern, content)
-        image_urls.update(images_in_content)
-
-        post_data = {
-            'wordpress_id': int(post_id),
-            'title': title,
-            'slug': slug,
-            'content': content,
+        image_urls.update(re.findall(img_pattern, record.content))
+
+        posts.append({
+            'wordpress_id': int(record.post_id),
+            'title': record.title,
+            'slug': record.slug,
+            'content': record.content,
             'excerpt': excerpt if excerpt else None,
             'published_at': published_at.isoformat(),
             'status': 'published',
-            'category_slug': category_slug,
-            'category_name': category_name
-        }
-
-        posts.append(post_data)
-
-        # Extract comments
-        for comment in item.findall('wp:comment', NAMESPACES):
-            comment_id = comment.find('wp:comment_id', NAMESPACES).text
-            comment_author = comment.find('wp:comment_author', NAMESPACES).text
-            comment_email = comment.find('wp:comment_author_email', NAMESPACES).text
-            comment_content = comment.find('wp:comment_content', NAMESPACES).text
-            comment_date = comment.find('wp:comment_date_gmt', NAMESPACES).text
-            comment_approved = comment.find('wp:comment_approved', NAMESPACES).text
-            comment_parent = comment.find('wp:comment_parent', NAMESPACES).text
-
-            try:
-                created_at = datetime.strptime(comment_date, '%Y-%m-%d %H:%M:%S')
-            except:
-                created_at = datetime.now()
-
-            comment_data = {
-                'wordpress_id': int(comment_id),
-                'post_wordpress_id': int(post_id),
-                'author_name': comment_author,
-                'author_email': comment_email,
-                'content': comment_content,
-                'created_at': created_at.isoformat(),
-                'status': 'approved' if comment_approved == '1' else 'pending',
-                'parent_wordpress_id': int(comment_parent) if comment_parent != '0' else None
-            }
+            'category_slug': record.category_slug,
+            'category_name': record.category_name
+        })
 
-            comments.append(comment_data)
+    save_index(xml_path, index)
 
+    print(f"Found {len(categories)} categories")
     print(f"Found {len(posts)} published posts")
     print(f"Found {len(comments)} comments")
     print(f"Found {len(image_urls)} unique image URLs in content")
@@ -160,47 +109,95 @@ def parse_wordpress_xml(xml_path):
         'image_urls': list(image_urls)
     }
 
-def import_to_supabase(data):
-    """Import parsed data to Supabase"""
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+def comment_data(comment):
+    """Convert a WXR comment record to the import format"""
+    try:
+        created_at = datetime.strptime(comment.date_gmt, '%Y-%m-%d %H:%M:%S')
+    except:
+        created_at = datetime.now()
 
-    print("\n=== Starting Supabase Import ===\n")
+    return {
+        'wordpress_id': int(comment.comment_id),
+        'post_wordpress_id': int(comment.post_id),
+        'author_name': comment.author_name,
+        'author_email': comment.author_email,
+        'content': comment.content,
+        'created_at': created_at.isoformat(),
+        'status': 'approved' if comment.approved == '1' else 'pending',
+        'parent_wordpress_id': int(comment.parent_id) if comment.parent_id != '0' else None
+    }
 
-    # 1. Import categories
+def comment_uuid(wordpress_id):
+    """Stable UUID for a WordPress comment"""
+    return str(uuid.uuid5(COMMENT_ID_NAMESPACE, f"wp-comment-{wordpress_id}"))
+
+def comment_levels(comments, comment_mapping):
+    """Group comments by thread depth so parents are written before replies.
+
+    A reply whose parent was not imported, or whose parent chain loops back
+    on itself, is treated as a top-level comment.
+    """
+    parents = {c['wordpress_id']: c['parent_wordpress_id'] for c in comments}
+    depths = {}
+
+    def depth_of(wordpress_id):
+        # Walk up to a comment of known depth, then number the chain back down
+        chain = []
+        visited = set()
+        while wordpress_id not in depths:
+            parent_id = parents[wordpress_id]
+            if parent_id not in comment_mapping or parent_id in visited or parent_id == wordpress_id:
+                depths[wordpress_id] = 0
+                break
+            visited.add(wordpress_id)
+            chain.append(wordpress_id)
+            wordpress_id = parent_id
+        depth = depths[wordpress_id]
+        for child_id in reversed(chain):
+            depth += 1
+            depths[child_id] = depth
+        return depth
+
+    levels = []
+    for comment in comments:
+        depth = depth_of(comment['wordpress_id'])
+        while len(levels) <= depth:
+            levels.append([])
+        levels[depth].append(comment)
+
+    return levels
+
+def import_to_supabase(data, sink):
+    """Import parsed data to Supabase (or another write sink)"""
+    print(f"\n=== Starting {sink.name} Import ===\n")
+
+    # 1. Import categories (one bulk upsert keyed on slug). Descriptions are
+    # left out so existing ones edited in the admin are not blanked.
     print("Importing categories...")
-    category_mapping = {}  # slug -> id
-
-    for term_id, cat_data in data['categories'].items():
-        # Check if category already exists
-        result = supabase.table('categories').select('id').eq('slug', cat_data['slug']).execute()
-
-        if result.data:
-            category_mapping[cat_data['slug']] = result.data[0]['id']
-            print(f"  ✓ Category '{cat_data['name']}' already exists")
-        else:
-            result = supabase.table('categories').insert(cat_data).execute()
-            category_mapping[cat_data['slug']] = result.data[0]['id']
-            print(f"  ✓ Created category '{cat_data['name']}'")
+    categories = [{'name': cat['name'], 'slug': cat['slug']} for cat in data['categories'].values()]
+    result = sink.write('categories', categories, on_conflict='slug', verbose=False)
+    category_mapping = {row['slug']: row['id'] for row in result.data}  # slug -> id
+    print(f"  ✓ Upserted {len(category_mapping)} categories")
 
     # 2. Get or create default user
     print("\nGetting default user...")
-    result = supabase.table('users').select('id').eq('email', 'michael@sullysblog.com').execute()
+    users = sink.select('users', 'id', email='michael@sullysblog.com')
 
-    if result.data:
-        default_user_id = result.data[0]['id']
+    if users:
+        default_user_id = users[0]['id']
         print(f"  ✓ Using existing user")
     else:
-        user_result = supabase.table('users').insert({
+        user_result = sink.write('users', [{
             'email': 'michael@sullysblog.com',
             'name': 'Michael Sullivan',
             'role': 'admin'
-        }).execute()
+        }], verbose=False)
         default_user_id = user_result.data[0]['id']
         print(f"  ✓ Created default user")
 
-    # 3. Import posts
+    # 3. Import posts (bulk upsert keyed on slug; reruns update in place)
     print("\nImporting posts...")
-    post_mapping = {}  # wordpress_id -> uuid
+    posts_to_upsert = []
 
     for post in data['posts']:
         # Map category
@@ -208,7 +205,7 @@ def import_to_supabase(data):
         if post['category_slug'] and post['category_slug'] in category_mapping:
             category_id = category_mapping[post['category_slug']]
 
-        post_insert = {
+        posts_to_upsert.append({
             'title': post['title'],
             'slug': post['slug'],
             'content': post['content'],
@@ -216,56 +213,48 @@ def import_to_supabase(data):
             'published_at': post['published_at'],
             'status': post['status'],
             'author_id': default_user_id,
-            'category_id': category_id
-        }
-
-        # Check if post already exists by slug
-        result = supabase.table('posts').select('id').eq('slug', post['slug']).execute()
-
-        if result.data:
-            # Update existing post
-            result = supabase.table('posts').update(post_insert).eq('slug', post['slug']).execute()
-            post_mapping[post['wordpress_id']] = result.data[0]['id']
-            print(f"  ✓ Updated post '{post['title']}'")
-        else:
-            # Insert new post
-            result = supabase.table('posts').insert(post_insert).execute()
-            post_mapping[post['wordpress_id']] = result.data[0]['id']
-            print(f"  ✓ Created post '{post['title']}'")
+            'category_id': category_id,
+            'wordpress_id': post['wordpress_id']
+        })
 
-    # 4. Import comments
-    print("\nImporting comments...")
-    comment_mapping = {}  # wordpress_id -> uuid
+    result = sink.write('posts', posts_to_upsert, on_conflict='slug')
+    for post, error in result.failed:
+        print(f"  ✗ Failed to import post '{post['title']}': {error}")
 
-    # First pass: Create all comments without parent relationships
-    for comment in data['comments']:
-        if comment['post_wordpress_id'] not in post_mapping:
-            continue
+    # The upsert returns the generated UUIDs, so no follow-up lookups
+    wordpress_ids = {post['slug']: post['wordpress_id'] for post in data['posts']}
+    post_mapping = {wordpress_ids[row['slug']]: row['id'] for row in result.data}  # wordpress_id -> uuid
+    print(f"  ✓ Upserted {len(post_mapping)} posts in {result.requests} requests")
 
-        comment_insert = {
+    # 4. Import comments
+    print("\nImporting comments...")
+    comments = [c for c in data['comments'] if c['post_wordpress_id'] in post_mapping]
+
+    # UUIDs are generated client-side so replies carry their parent_id in the
+    # same bulk upsert instead of needing a second update pass
+    comment_mapping = {c['wordpress_id']: comment_uuid(c['wordpress_id']) for c in comments}  # wordpress_id -> uuid
+
+    created = 0
+    for depth, level in enumerate(comment_levels(comments, comment_mapping)):
+        rows = [{
+            'id': comment_mapping[comment['wordpress_id']],
+            # Top-level includes replies that broke a parent cycle
+            'parent_id': comment_mapping[comment['parent_wordpress_id']] if depth else None,
             'post_id': post_mapping[comment['post_wordpress_id']],
             'author_name': comment['author_name'],
             'author_email': comment['author_email'],
             'content': comment['content'],
             'created_at': comment['created_at'],
             'status': comment['status']
-        }
-
-        result = supabase.table('comments').insert(comment_insert).execute()
-        comment_mapping[comment['wordpress_id']] = result.data[0]['id']
+        } for comment in level]
 
-    print(f"  ✓ Created {len(comment_mapping)} comments")
+        result = sink.write('comments', rows, on_conflict='id', verbose=False)
+        created += result.written
+        for comment, error in result.failed:
+            print(f"  ✗ Failed to import comment by {comment['author_name']}: {error}")
+        print(f"  ✓ Depth {depth}: {result.written} comments in {result.requests} requests")
 
-    # Second pass: Update parent relationships
-    print("  Updating comment parent relationships...")
-    for comment in data['comments']:
-        if comment['parent_wordpress_id'] and comment['parent_wordpress_id'] in comment_mapping:
-            parent_id = comment_mapping[comment['parent_wordpress_id']]
-            comment_id = comment_mapping[comment['wordpress_id']]
-
-            supabase.table('comments').update({
-                'parent_id': parent_id
-            }).eq('id', comment_id).execute()
+    print(f"  ✓ Upserted {created} comments")
 
     print("\n=== Import Complete ===")
     print(f"Categories: {len(category_mapping)}")
@@ -283,14 +272,26 @@ def save_image_urls(urls, output_file='image_urls.txt'):
 
 if __name__ == '__main__':
     XML_PATH = '/Users/michaelsullivan/Downloads/sullysblogcom.WordPress.2025-12-24.xml'
+    IMAGE_URLS_PATH = '/Users/michaelsullivan/claude-projects/sullysblog-rebuild/sullysblog/scripts/image_urls.txt'
+
+    parser = argparse.ArgumentParser(description="Migrate WordPress XML export to Supabase")
+    parser.add_argument("--xml-file", default=XML_PATH, help="Path to the WordPress XML export")
+    parser.add_argument("--image-urls", default=IMAGE_URLS_PATH, help="Where to save content image URLs")
+    add_sink_arguments(parser)
+    args = parser.parse_args()
 
     # Parse XML
-    data = parse_wordpress_xml(XML_PATH)
+    data = parse_wordpress_xml(args.xml_file)
 
-    # Import to Supabase
-    image_urls = import_to_supabase(data)
+    # Import to Supabase (or --sink)
+    sink = open_sink(args.sink, lambda: create_client(SUPABASE_URL, SUPABASE_KEY),
+                     args.database_url, args.sqlite_path)
+    try:
+        image_urls = import_to_supabase(data, sink)
+    finally:
+        sink.close()
 
     # Save image URLs for later processing
-    save_image_urls(image_urls, '/Users/michaelsullivan/claude-projects/sullysblog-rebuild/sullysblog/scripts/image_urls.txt')
+    save_image_urls(image_urls, args.image_urls)
 
     print("\nMigration complete! Image URLs saved for later download.")
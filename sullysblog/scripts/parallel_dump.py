@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Parallel parsing of WordPress mysqldump files across processes
+
+The dump is memory-mapped and split into byte ranges that start at INSERT
+statement boundaries (mysqldump begins every statement on a new line and
+escapes newlines inside values, so "\\nINSERT INTO `" only occurs between
+statements). Each range is tokenized in a ProcessPoolExecutor worker by
+wp_sql_dump.iter_dump_rows, which maps the file itself, and the per-range
+rows are concatenated in file order, so the result is identical to a serial
+parse.
+
+CREATE TABLE statements only appear once, near the start of each table's
+data, so the column lists are collected up front and handed to every
+worker for row-width validation.
+
+Usage:
+    from parallel_dump import parallel_demux
+
+    tables = parallel_demux('backup.sql', ['posts', 'postmeta'], workers=8)
+"""
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from wp_sql_dump import CREATE_TABLE_RE, COLUMN_RE, WP_PREFIX, Select, iter_dump_rows
+
+STATEMENT_BOUNDARY = b"\nINSERT INTO `"
+CREATE_TABLE = b"\nCREATE TABLE `"
+
+# Ranges per worker; more, smaller ranges even out uneven tables
+RANGES_PER_WORKER = 4
+
+
+def read_schema(sql_file: str) -> Dict[str, List[str]]:
+    """Column names of every CREATE TABLE in the dump"""
+    schema = {}
+    if os.path.getsize(sql_file) == 0:
+        return schema
+
+    with open(sql_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # A statement at byte 0 has no newline before it
+        starts = [0] if mm[:len(CREATE_TABLE) - 1] == CREATE_TABLE[1:] else []
+        pos = mm.find(CREATE_TABLE)
+        while pos != -1:
+            starts.append(pos + 1)
+            pos = mm.find(CREATE_TABLE, pos + 1)
+
+        for start in starts:
+            create = CREATE_TABLE_RE.match(mm, start)
+            if create:
+                schema[create.group(1).decode('utf-8')] = [
+                    name.decode('utf-8') for name in COLUMN_RE.findall(create.group(2))
+                ]
+
+    return schema
+
+
+def split_ranges(sql_file: str, parts: int) -> List[Tuple[int, int]]:
+    """Split the dump into about `parts` byte ranges at INSERT boundaries"""
+    size = os.path.getsize(sql_file)
+    if size == 0 or parts <= 1:
+        return [(0, size)]
+
+    boundaries = [0]
+    with open(sql_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, parts):
+            target = max(size * i // parts, boundaries[-1])
+            found = mm.find(STATEMENT_BOUNDARY, target)
+            if found == -1:
+                break
+            if found + 1 > boundaries[-1]:
+                boundaries.append(found + 1)
+    boundaries.append(size)
+
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _parse_range(
+    sql_file: str,
+    start: int,
+    end: int,
+    tables: List[str],
+    schema: Dict[str, List[str]],
+    expected_columns: Dict[str, int],
+    select: Dict[str, Select],
+) -> Dict[str, List[tuple]]:
+    """Worker: rows of the wanted tables within one byte range"""
+    rows = {table: [] for table in tables}
+    for table, row in iter_dump_rows(sql_file, tables=tables, schema=dict(schema),
+                                     expected_columns=expected_columns, select=select,
+                                     start=start, end=end):
+        rows[table].append(row)
+    return rows
+
+
+def parallel_demux(
+    sql_file: str,
+    tables: Iterable[str],
+    workers: Optional[int] = None,
+    expected_columns: Optional[Dict[str, int]] = None,
+    select: Optional[Dict[str, Select]] = None,
+) -> Dict[str, List[tuple]]:
+    """All rows of the given WordPress tables (names without prefix).
+
+    Same result as collecting demux_dump's output, parsed on `workers`
+    processes (default: one per CPU).
+    """
+    workers = workers or os.cpu_count() or 1
+    names = {f"{WP_PREFIX}{table}": table for table in tables}
+    expected = {f"{WP_PREFIX}{name}": count for name, count in (expected_columns or {}).items()}
+    selects = {f"{WP_PREFIX}{name}": query for name, query in (select or {}).items()}
+    schema = read_schema(sql_file)
+    ranges = split_ranges(sql_file, workers * RANGES_PER_WORKER)
+
+    data = {table: [] for table in names.values()}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_parse_range, sql_file, start, end, list(names), schema, expected, selects)
+            for start, end in ranges
+        ]
+        # Ranges are merged in file order
+        for future in futures:
+            for table, rows in future.result().items():
+                data[names[table]].extend(rows)
+
+    return data
@@ -3,17 +3,11 @@
 Parse dictionary terms from extracted SQL
 """
 
-import re
+from wp_sql_dump import table_rows
 
-# Read the extracted SQL
-with open('/tmp/dictionary-insert.sql', 'r', encoding='utf-8', errors='ignore') as f:
-    sql = f.read()
-
-# Find all VALUES entries using regex
-# Pattern: (id,'term_name','slug',page_id,'definition',...)
-pattern = r"\((\d+),'([^']+)','([^']+)',(\d+),"
-
-matches = re.findall(pattern, sql)
+# Stream the rows of the extracted dictionary INSERT
+# Each row: (id, term_name, slug, page_id, definition, ...)
+matches = [row[:4] for row in table_rows('/tmp/dictionary-insert.sql', 'domain_dictionary')]
 
 print(f"\n📊 Found {len(matches)} dictionary terms:\n")
 
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Concurrent batched writer (and paginated reader) for Supabase tables
+
+Rows are packed into batches by JSON payload size (post bodies range from
+1 KB to 200 KB, so a fixed row count either wastes round trips or trips the
+request size limit), several batches are sent in parallel over a thread
+pool, and a failing batch is split in half and retried until the bad rows
+are isolated instead of falling back to one request per row.
+
+Usage:
+    from supabase_writer import write_batches
+
+    result = write_batches(supabase, 'posts', rows)
+    print(result.written, len(result.failed))
+
+    # Idempotent rerun: update rows that already exist
+    result = write_batches(supabase, 'posts', rows, on_conflict='slug')
+
+    # Stream a whole table, page by page
+    for page in iter_pages(supabase, 'posts', 'id, content'):
+        ...
+
+    # Look up / delete rows by a list of keys
+    rows = fetch_in(supabase, 'posts', 'id, wordpress_id', 'wordpress_id', ids)
+    deleted = delete_in(supabase, 'posts', 'wordpress_id', ids)
+"""
+
+import json
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+# Requests in flight at once
+MAX_WORKERS = 4
+
+# Batch limits: whichever is reached first closes the batch
+MAX_BATCH_ROWS = 500
+MAX_BATCH_BYTES = 2 * 1024 * 1024
+
+# Rows per page when reading a table
+READ_PAGE_SIZE = 500
+
+# Keys per `in` filter; they travel in the query string, which has a length limit
+IN_CHUNK_SIZE = 200
+
+# Errors that fail every row of a batch alike (auth, RLS, unknown column or
+# table), from PostgREST, Postgres or SQLite; such batches are not bisected
+BATCH_ERROR_RE = re.compile(
+    r"PGRST(?:106|204|205|301|302)|'code': '(?:42501|42703|42P01|28\w{3})'"
+    r"|row-level security|permission denied|invalid api key|jwt"
+    r"|column .* does not exist|relation .* does not exist"
+    r"|no such table|has no column named",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class WriteResult:
+    """Outcome of write_batches"""
+    written: int = 0
+    requests: int = 0
+    failed: List[Tuple[dict, str]] = field(default_factory=list)
+    data: List[dict] = field(default_factory=list)
+
+
+def payload_size(row: dict) -> int:
+    """Approximate JSON size of a row in bytes"""
+    return len(json.dumps(row, default=str).encode('utf-8'))
+
+
+def pack_batches(
+    rows: Iterable[dict],
+    max_rows: int = MAX_BATCH_ROWS,
+    max_bytes: int = MAX_BATCH_BYTES,
+) -> List[List[dict]]:
+    """Group rows into batches bounded by row count and payload bytes"""
+    batches = []
+    batch = []
+    batch_bytes = 0
+
+    for row in rows:
+        size = payload_size(row)
+        if batch and (len(batch) >= max_rows or batch_bytes + size > max_bytes):
+            batches.append(batch)
+            batch = []
+            batch_bytes = 0
+        batch.append(row)
+        batch_bytes += size
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+def run_batches(
+    send: Callable[[List[dict]], List[dict]],
+    table: str,
+    rows: Iterable[dict],
+    max_workers: int = MAX_WORKERS,
+    max_rows: int = MAX_BATCH_ROWS,
+    max_bytes: int = MAX_BATCH_BYTES,
+    verbose: bool = True,
+    on_conflict: Optional[str] = None,
+) -> WriteResult:
+    """Pack rows into batches and hand them to `send` on a thread pool.
+
+    `send(batch)` writes one batch and returns the written rows. Failed
+    batches are bisected and retried until the bad rows are isolated; rows
+    that still fail are reported in `failed` together with the error
+    message. A batch failing with an error that no row could cause alone
+    (BATCH_ERROR_RE) is reported whole instead of being bisected.
+    """
+    result = WriteResult()
+
+    if on_conflict:
+        # Postgres rejects an upsert that touches the same row twice
+        keys = [key.strip() for key in on_conflict.split(',')]
+        rows = list({tuple(row[key] for key in keys): row for row in rows}.values())
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {
+            pool.submit(send, batch): batch
+            for batch in pack_batches(rows, max_rows, max_bytes)
+        }
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = pending.pop(future)
+                result.requests += 1
+                try:
+                    result.data.extend(future.result())
+                except Exception as e:
+                    error = str(e)
+                    if len(batch) == 1 or BATCH_ERROR_RE.search(error):
+                        result.failed.extend((row, error) for row in batch)
+                        if verbose:
+                            count = f"{len(batch)} rows" if len(batch) > 1 else "row"
+                            print(f"    ✗ Failed to write {count} to {table}: {e}")
+                        continue
+                    # Bisect so one bad row does not cost a request per row
+                    middle = len(batch) // 2
+                    for half in (batch[:middle], batch[middle:]):
+                        pending[pool.submit(send, half)] = half
+                    continue
+
+                result.written += len(batch)
+                if verbose:
+                    print(f"  ✓ Wrote {len(batch)} rows to {table} (total: {result.written})")
+
+    return result
+
+
+def write_batches(
+    supabase,
+    table: str,
+    rows: Iterable[dict],
+    max_workers: int = MAX_WORKERS,
+    max_rows: int = MAX_BATCH_ROWS,
+    max_bytes: int = MAX_BATCH_BYTES,
+    verbose: bool = True,
+    on_conflict: Optional[str] = None,
+) -> WriteResult:
+    """Insert rows into a Supabase table with concurrent, size-bounded batches.
+
+    With `on_conflict` (a unique column such as 'slug' or 'wordpress_id')
+    rows are upserted instead, so reruns update in place. Either way the
+    written rows, including generated ids, are collected in `data`.
+    """
+    def send(batch: List[dict]) -> List[dict]:
+        query = supabase.table(table)
+        if on_conflict:
+            query = query.upsert(batch, on_conflict=on_conflict)
+        else:
+            query = query.insert(batch)
+        return query.execute().data or []
+
+    return run_batches(send, table, rows, max_workers, max_rows, max_bytes, verbose, on_conflict)
+
+
+def iter_pages(
+    supabase,
+    table: str,
+    columns: str,
+    key: str = 'id',
+    page_size: int = READ_PAGE_SIZE,
+) -> Iterator[List[dict]]:
+    """Yield every row of a table in pages ordered by `key`.
+
+    Pages are fetched with keyset pagination (key > last key seen) rather
+    than offsets, so each request is an index range scan, and reading stops
+    only at an empty page, so a server-side row cap smaller than
+    `page_size` cannot silently truncate the table. `columns` must include
+    `key`.
+    """
+    last = None
+    while True:
+        query = supabase.table(table).select(columns).order(key).limit(page_size)
+        if last is not None:
+            query = query.gt(key, last)
+        page = query.execute().data or []
+        if not page:
+            return
+        yield page
+        last = page[-1][key]
+
+
+def _chunks(values: List, size: int) -> Iterator[List]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def fetch_in(
+    supabase,
+    table: str,
+    columns: str,
+    key: str,
+    values: Iterable,
+    chunk_size: int = IN_CHUNK_SIZE,
+) -> List[dict]:
+    """Rows whose `key` is one of `values`, fetched `chunk_size` keys at a time"""
+    rows = []
+    for chunk in _chunks(list(values), chunk_size):
+        rows.extend(supabase.table(table).select(columns).in_(key, chunk).execute().data or [])
+    return rows
+
+
+def delete_in(
+    supabase,
+    table: str,
+    key: str,
+    values: Iterable,
+    chunk_size: int = IN_CHUNK_SIZE,
+) -> Tuple[int, List[Tuple[list, str]]]:
+    """Delete rows whose `key` is one of `values`.
+
+    Returns the number of rows deleted and the (keys, error) of every chunk
+    that failed.
+    """
+    deleted = 0
+    failed = []
+    for chunk in _chunks(list(values), chunk_size):
+        try:
+            deleted += len(supabase.table(table).delete().in_(key, chunk).execute().data or [])
+        except Exception as e:
+            failed.append((chunk, str(e)))
+    return deleted, failed
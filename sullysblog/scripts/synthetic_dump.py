@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Synthetic WordPress mysqldump generator
+
+Writes a dump shaped like the real backup (wp_5sn88nclkq_* tables, one
+DROP/CREATE/LOCK/extended-INSERT block per table, mysqldump escaping) at a
+configurable scale, for benchmarking and exercising the dump parsers
+without the real backup.sql:
+
+    posts              posts, pages, revisions and attachments with long
+                       HTML bodies full of quotes, escapes, parentheses,
+                       shortcodes, CRLFs and non-ASCII text
+    postmeta           _thumbnail_id, _edit_lock, SEO descriptions and PHP
+                       serialized attachment metadata, some NULL values
+    comments           threaded comments on posts
+    domain_dictionary  glossary terms, as read by extract-dictionary-terms.py
+
+Output is deterministic for a given seed and scale; each table has its own
+random stream, so leaving a table out does not change the others.
+
+Usage:
+    from synthetic_dump import DumpScale, write_dump, write_sized_dump
+
+    counts = write_dump('synthetic.sql', DumpScale(posts=5000))
+    counts = write_sized_dump('synthetic.sql', size_mb=500, tables=['posts'])
+
+    python scripts/synthetic_dump.py synthetic.sql --posts 5000
+    python scripts/synthetic_dump.py synthetic.sql --size-mb 500
+"""
+
+import argparse
+import io
+import random
+from dataclasses import dataclass, replace
+from typing import Dict, List, Sequence, TextIO, Tuple
+
+from wp_sql_dump import POSTS_COLUMNS, WP_PREFIX
+
+# MySQL type of each wp_posts column
+POSTS_TYPES: Dict[str, str] = {
+    'ID': 'bigint unsigned NOT NULL AUTO_INCREMENT',
+    'post_author': "bigint unsigned NOT NULL DEFAULT '0'",
+    'post_date': "datetime NOT NULL DEFAULT '0000-00-00 00:00:00'",
+    'post_date_gmt': "datetime NOT NULL DEFAULT '0000-00-00 00:00:00'",
+    'post_content': 'longtext NOT NULL',
+    'post_title': 'text NOT NULL',
+    'post_excerpt': 'text NOT NULL',
+    'post_status': "varchar(20) NOT NULL DEFAULT 'publish'",
+    'comment_status': "varchar(20) NOT NULL DEFAULT 'open'",
+    'ping_status': "varchar(20) NOT NULL DEFAULT 'open'",
+    'post_password': "varchar(255) NOT NULL DEFAULT ''",
+    'post_name': "varchar(200) NOT NULL DEFAULT ''",
+    'to_ping': 'text NOT NULL',
+    'pinged': 'text NOT NULL',
+    'post_modified': "datetime NOT NULL DEFAULT '0000-00-00 00:00:00'",
+    'post_modified_gmt': "datetime NOT NULL DEFAULT '0000-00-00 00:00:00'",
+    'post_content_filtered': 'longtext NOT NULL',
+    'post_parent': "bigint unsigned NOT NULL DEFAULT '0'",
+    'guid': "varchar(255) NOT NULL DEFAULT ''",
+    'menu_order': "int NOT NULL DEFAULT '0'",
+    'post_type': "varchar(20) NOT NULL DEFAULT 'post'",
+    'post_mime_type': "varchar(100) NOT NULL DEFAULT ''",
+    'comment_count': "bigint NOT NULL DEFAULT '0'",
+}
+
+# (name, MySQL type) per table, in WordPress column order
+TABLE_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    'comments': [
+        ('comment_ID', 'bigint unsigned NOT NULL AUTO_INCREMENT'),
+        ('comment_post_ID', "bigint unsigned NOT NULL DEFAULT '0'"),
+        ('comment_author', 'tinytext NOT NULL'),
+        ('comment_author_email', "varchar(100) NOT NULL DEFAULT ''"),
+        ('comment_author_url', "varchar(200) NOT NULL DEFAULT ''"),
+        ('comment_author_IP', "varchar(100) NOT NULL DEFAULT ''"),
+        ('comment_date', "datetime NOT NULL DEFAULT '0000-00-00 00:00:00'"),
+        ('comment_date_gmt', "datetime NOT NULL DEFAULT '0000-00-00 00:00:00'"),
+        ('comment_content', 'text NOT NULL'),
+        ('comment_karma', "int NOT NULL DEFAULT '0'"),
+        ('comment_approved', "varchar(20) NOT NULL DEFAULT '1'"),
+        ('comment_agent', "varchar(255) NOT NULL DEFAULT ''"),
+        ('comment_type', "varchar(20) NOT NULL DEFAULT 'comment'"),
+        ('comment_parent', "bigint unsigned NOT NULL DEFAULT '0'"),
+        ('user_id', "bigint unsigned NOT NULL DEFAULT '0'"),
+    ],
+    'domain_dictionary': [
+        ('id', 'int NOT NULL AUTO_INCREMENT'),
+        ('term_name', 'varchar(255) NOT NULL'),
+        ('slug', 'varchar(255) NOT NULL'),
+        ('page_id', 'bigint unsigned DEFAULT NULL'),
+        ('definition', 'longtext'),
+        ('date_created', 'datetime DEFAULT NULL'),
+    ],
+    'postmeta': [
+        ('meta_id', 'bigint unsigned NOT NULL AUTO_INCREMENT'),
+        ('post_id', "bigint unsigned NOT NULL DEFAULT '0'"),
+        ('meta_key', 'varchar(255) DEFAULT NULL'),
+        ('meta_value', 'longtext'),
+    ],
+    # Column order is shared with the parser (wp_sql_dump.POSTS_COLUMNS)
+    'posts': [(name, POSTS_TYPES[name]) for name in POSTS_COLUMNS],
+}
+
+# mysqldump writes tables in name order
+TABLES = tuple(sorted(TABLE_COLUMNS))
+
+# Rows per extended INSERT, roughly what mysqldump emits for post bodies
+ROWS_PER_INSERT = 50
+
+# Posts generated to estimate bytes per post for write_sized_dump
+SIZE_SAMPLE_POSTS = 200
+
+WORDS = (
+    "domain names investing portfolio sale brokerage escrow registrar "
+    "premium keyword brandable auction renewal marketplace parking traffic"
+).split()
+
+# Multi-byte text, as found in pasted quotes and names
+UNICODE_WORDS = ["café", "naïve", "“smart quotes”", "résumé", "—", "€1,000", "日本"]
+
+POST_TYPES = ('post', 'post', 'post', 'page', 'revision', 'attachment')
+
+META_KEYS = ('_edit_lock', '_thumbnail_id', '_yoast_wpseo_metadesc', '_wp_page_template')
+
+TERMS = ("UDRP", "WIPO", "Drop Catching", "Escrow", "Parking", "Registrar", "Registry",
+         "TLD", "ccTLD", "Premium Domain", "Brandable", "Typo Domain", "WHOIS", "Backorder")
+
+
+@dataclass
+class DumpScale:
+    """How much of each table to generate"""
+    posts: int = 1000
+    meta_per_post: int = 4          # average postmeta rows per post
+    comments_per_post: int = 3      # average comments per post/page
+    dictionary_terms: int = 102
+    max_paragraphs: int = 40        # post bodies have 1..max_paragraphs paragraphs
+
+
+def sql_escape(text: str) -> str:
+    """Escape a string the way mysqldump does"""
+    return (
+        text.replace('\\', '\\\\')
+        .replace("'", "\\'")
+        .replace('"', '\\"')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+        .replace('\x00', '\\0')
+        .replace('\x1a', '\\Z')
+    )
+
+
+def quoted(text: str) -> str:
+    return f"'{sql_escape(text)}'"
+
+
+def random_date(rng: random.Random) -> str:
+    return (f"20{rng.randint(10, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+            f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}")
+
+
+def random_words(rng: random.Random, low: int, high: int) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(low, high))]
+    if rng.random() < 0.2:
+        words[rng.randrange(len(words))] = rng.choice(UNICODE_WORDS)
+    return ' '.join(words)
+
+
+def random_body(rng: random.Random, paragraphs: int) -> str:
+    """Post HTML with the characters that trip naive SQL parsers"""
+    parts = []
+    for _ in range(paragraphs):
+        parts.append(
+            f'<p>{random_words(rng, 40, 160)} (it\'s "worth" it), see '
+            f'<a href="https://sullysblog.com/?p={rng.randint(1, 9999)}">'
+            f'this post (part {rng.randint(1, 9)})</a>; C:\\path\\file</p>\r\n'
+        )
+        roll = rng.random()
+        if roll < 0.15:
+            upload = f"20{rng.randint(10, 25)}/{rng.randint(1, 12):02d}/{rng.choice(WORDS)}-{rng.randint(1, 999)}"
+            parts.append(
+                f'[caption id="attachment_{rng.randint(1, 9999)}" align="aligncenter" width="300"]'
+                f'<img src="https://sullysblog.com/wp-content/uploads/{upload}-300x200.jpg" '
+                f'alt="{rng.choice(WORDS)} (photo)" /> Caption, with \'quotes\'[/caption]\n'
+            )
+        elif roll < 0.2:
+            parts.append(f"<pre>\tif (a) {{ b('c'); }}\n\tprint(\"d\\n\");</pre>\n")
+    return ''.join(parts)
+
+
+def post_row(rng: random.Random, post_id: int, post_type: str, max_paragraphs: int) -> str:
+    """One wp_posts row as SQL"""
+    status = {'revision': 'inherit', 'attachment': 'inherit'}.get(post_type)
+    if status is None:
+        status = 'publish' if rng.random() < 0.9 else rng.choice(('draft', 'private', 'trash'))
+    date = random_date(rng)
+    modified = random_date(rng) if rng.random() < 0.5 else date
+
+    if post_type == 'attachment':
+        upload = f"{date[:4]}/{date[5:7]}/{rng.choice(WORDS)}-{post_id}.jpg"
+        content = ''
+        guid = f"https://sullysblog.com/wp-content/uploads/{upload}"
+        mime = 'image/jpeg'
+    else:
+        content = random_body(rng, rng.randint(1, max_paragraphs))
+        guid = f"https://sullysblog.com/?p={post_id}"
+        mime = ''
+
+    title = f"Title ({post_id}) it's {random_words(rng, 2, 8)}"
+    excerpt = random_words(rng, 10, 30) if rng.random() < 0.3 else ''
+    parent = rng.randint(1, post_id) if post_type in ('revision', 'attachment') else 0
+
+    values = [
+        str(post_id), '1', f"'{date}'", f"'{date}'",
+        quoted(content), quoted(title), quoted(excerpt),
+        f"'{status}'", "'open'", "'open'", "''", f"'{post_type}-{post_id}'",
+        "''", "''", f"'{modified}'", f"'{modified}'", "''", str(parent),
+        quoted(guid), '0', f"'{post_type}'", f"'{mime}'", str(rng.randint(0, 40)),
+    ]
+    return '(' + ','.join(values) + ')'
+
+
+def meta_value(rng: random.Random, key: str, posts: int) -> str:
+    if key == '_edit_lock':
+        return quoted(f"{rng.randint(1300000000, 1760000000)}:1")
+    if key == '_thumbnail_id':
+        return quoted(str(rng.randint(1, posts)))
+    if key == '_yoast_wpseo_metadesc':
+        if rng.random() < 0.1:
+            return 'NULL'
+        return quoted(f"{random_words(rng, 8, 20)} – it's \"the\" guide (2024)")
+    return quoted(rng.choice(('default', 'page-full-width.php', 'template-sidebar.php')))
+
+
+def attachment_metadata(rng: random.Random, post_id: int) -> str:
+    """PHP serialized _wp_attachment_metadata: braces, quotes and semicolons"""
+    name = f"{rng.choice(WORDS)}-{post_id}.jpg"
+    return quoted(
+        f'a:4:{{s:5:"width";i:{rng.randint(300, 2400)};s:6:"height";i:{rng.randint(200, 1600)};'
+        f's:4:"file";s:{len(name)}:"{name}";s:5:"sizes";a:1:{{s:9:"thumbnail";a:2:'
+        f'{{s:4:"file";s:{len(name) + 8}:"{name[:-4]}-150x150.jpg";s:9:"mime-type";s:10:"image/jpeg";}}}}}}'
+    )
+
+
+def create_table(table: str) -> str:
+    full = f"{WP_PREFIX}{table}"
+    columns = TABLE_COLUMNS[table]
+    lines = [f"  `{name}` {kind}" for name, kind in columns]
+    lines.append(f"  PRIMARY KEY (`{columns[0][0]}`)")
+    body = ',\n'.join(lines)
+    return (
+        f"--\n-- Table structure for table `{full}`\n--\n\n"
+        f"DROP TABLE IF EXISTS `{full}`;\n"
+        f"CREATE TABLE `{full}` (\n{body}\n"
+        f") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_520_ci;\n\n"
+        f"LOCK TABLES `{full}` WRITE;\n"
+        f"/*!40000 ALTER TABLE `{full}` DISABLE KEYS */;\n"
+    )
+
+
+def write_table(f: TextIO, table: str, rows, rows_per_insert: int) -> int:
+    """Write a table block; `rows` yields SQL row tuples. Returns the row count."""
+    full = f"{WP_PREFIX}{table}"
+    f.write(create_table(table))
+
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        count += 1
+        if len(batch) == rows_per_insert:
+            f.write(f"INSERT INTO `{full}` VALUES {','.join(batch)};\n")
+            batch = []
+    if batch:
+        f.write(f"INSERT INTO `{full}` VALUES {','.join(batch)};\n")
+
+    f.write(f"/*!40000 ALTER TABLE `{full}` ENABLE KEYS */;\nUNLOCK TABLES;\n\n")
+    return count
+
+
+def _post_types(scale: DumpScale, seed: int) -> List[str]:
+    """post_type by ID - 1; postmeta and comments follow the same types"""
+    rng = random.Random(f"{seed}-post-types")
+    return [rng.choice(POST_TYPES) for _ in range(scale.posts)]
+
+
+def _posts(scale: DumpScale, seed: int, post_types: List[str]):
+    rng = random.Random(f"{seed}-posts")
+    for post_id, post_type in enumerate(post_types, 1):
+        yield post_row(rng, post_id, post_type, scale.max_paragraphs)
+
+
+def _postmeta(scale: DumpScale, seed: int, post_types: List[str]):
+    rng = random.Random(f"{seed}-postmeta")
+    meta_id = 0
+    for post_id, post_type in enumerate(post_types, 1):
+        if post_type == 'attachment':
+            meta_id += 1
+            yield f"({meta_id},{post_id},'_wp_attachment_metadata',{attachment_metadata(rng, post_id)})"
+            continue
+        for _ in range(rng.randint(0, 2 * scale.meta_per_post)):
+            meta_id += 1
+            key = rng.choice(META_KEYS)
+            yield f"({meta_id},{post_id},{quoted(key)},{meta_value(rng, key, scale.posts)})"
+
+
+def _comments(scale: DumpScale, seed: int, post_types: List[str]):
+    rng = random.Random(f"{seed}-comments")
+    comment_id = 0
+    for post_id, post_type in enumerate(post_types, 1):
+        if post_type not in ('post', 'page'):
+            continue
+        thread = []
+        for _ in range(rng.randint(0, 2 * scale.comments_per_post)):
+            comment_id += 1
+            parent = rng.choice(thread) if thread and rng.random() < 0.4 else 0
+            thread.append(comment_id)
+            author = f"{rng.choice(WORDS).title()} O'{rng.choice(WORDS).title()}"
+            date = random_date(rng)
+            content = f"{random_words(rng, 5, 60)} (great \"post\"!)\r\nThanks, it's {rng.choice(UNICODE_WORDS)}"
+            yield '(' + ','.join([
+                str(comment_id), str(post_id), quoted(author),
+                quoted(f"reader{comment_id}@example.com"),
+                quoted(f"https://{rng.choice(WORDS)}.com" if rng.random() < 0.3 else ''),
+                quoted(f"192.0.2.{rng.randint(1, 254)}"), f"'{date}'", f"'{date}'",
+                quoted(content), '0', f"'{rng.choice(('1', '1', '1', '0', 'spam'))}'",
+                quoted("Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)"), "'comment'",
+                str(parent), '0',
+            ]) + ')'
+
+
+def _domain_dictionary(scale: DumpScale, seed: int):
+    rng = random.Random(f"{seed}-domain_dictionary")
+    for term_id in range(1, scale.dictionary_terms + 1):
+        term = TERMS[(term_id - 1) % len(TERMS)]
+        if term_id > len(TERMS):
+            term = f"{term} {term_id}"
+        slug = term.lower().replace(' ', '-')
+        definition = (f"<p><strong>{term}</strong> ({random_words(rng, 2, 4)}): "
+                      f"{random_words(rng, 30, 120)}. It's \"key\" to domain investing.</p>\r\n")
+        page_id = str(rng.randint(1, max(scale.posts, 1))) if rng.random() < 0.8 else 'NULL'
+        yield (f"({term_id},{quoted(term)},{quoted(slug)},{page_id},{quoted(definition)},"
+               f"'{random_date(rng)}')")
+
+
+def write_dump_to(f: TextIO, scale: DumpScale, tables: Sequence[str] = TABLES,
+                  seed: int = 42, rows_per_insert: int = ROWS_PER_INSERT) -> Dict[str, int]:
+    """Write the dump to an open text file; returns rows written per table"""
+    unknown = set(tables) - set(TABLE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(sorted(unknown))}")
+
+    post_types = _post_types(scale, seed)
+
+    sources = {
+        'comments': lambda: _comments(scale, seed, post_types),
+        'domain_dictionary': lambda: _domain_dictionary(scale, seed),
+        'postmeta': lambda: _postmeta(scale, seed, post_types),
+        'posts': lambda: _posts(scale, seed, post_types),
+    }
+
+    f.write("-- MySQL dump 10.13  Distrib 8.0.36, for Linux (x86_64)\n--\n"
+            "-- Host: localhost    Database: sullysblog\n"
+            "-- ------------------------------------------------------\n\n"
+            "/*!40101 SET NAMES utf8mb4 */;\n/*!40014 SET FOREIGN_KEY_CHECKS=0 */;\n\n")
+    counts = {}
+    for table in TABLES:
+        if table in tables:
+            counts[table] = write_table(f, table, sources[table](), rows_per_insert)
+    f.write("-- Dump completed\n")
+    return counts
+
+
+def write_dump(path: str, scale: DumpScale = DumpScale(), tables: Sequence[str] = TABLES,
+               seed: int = 42, rows_per_insert: int = ROWS_PER_INSERT) -> Dict[str, int]:
+    """Write a synthetic dump file; returns rows written per table"""
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        return write_dump_to(f, scale, tables, seed, rows_per_insert)
+
+
+def scale_for_size(size_mb: float, tables: Sequence[str] = TABLES, seed: int = 42,
+                   base: DumpScale = DumpScale()) -> DumpScale:
+    """`base` with the post count set so the dump comes out near size_mb"""
+    # The dictionary does not grow with the post count, so leave it out of the sample
+    sample = replace(base, posts=SIZE_SAMPLE_POSTS, dictionary_terms=0)
+    out = io.StringIO()
+    write_dump_to(out, sample, tables, seed)
+    per_post = len(out.getvalue().encode('utf-8')) / SIZE_SAMPLE_POSTS
+    return replace(base, posts=max(1, int(size_mb * 1024 * 1024 / per_post)))
+
+
+def write_sized_dump(path: str, size_mb: float, tables: Sequence[str] = TABLES,
+                     seed: int = 42, base: DumpScale = DumpScale()) -> Dict[str, int]:
+    """Write a synthetic dump of roughly size_mb megabytes"""
+    return write_dump(path, scale_for_size(size_mb, tables, seed, base), tables, seed)
+
+
+def main():
+    defaults = DumpScale()
+    parser = argparse.ArgumentParser(description="Generate a synthetic WordPress mysqldump")
+    parser.add_argument("output", help="Path of the .sql file to write")
+    parser.add_argument("--size-mb", type=float, help="Target size; sets the post count")
+    parser.add_argument("--posts", type=int, default=defaults.posts, help="Rows in wp_posts")
+    parser.add_argument("--meta-per-post", type=int, default=defaults.meta_per_post,
+                        help="Average postmeta rows per post")
+    parser.add_argument("--comments-per-post", type=int, default=defaults.comments_per_post,
+                        help="Average comments per post or page")
+    parser.add_argument("--dictionary-terms", type=int, default=defaults.dictionary_terms,
+                        help="Rows in domain_dictionary")
+    parser.add_argument("--max-paragraphs", type=int, default=defaults.max_paragraphs,
+                        help="Upper bound on paragraphs per post body")
+    parser.add_argument("--tables", default=','.join(TABLES),
+                        help=f"Comma-separated tables to include (default: {','.join(TABLES)})")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    tables = [table.strip() for table in args.tables.split(',') if table.strip()]
+    scale = DumpScale(posts=args.posts, meta_per_post=args.meta_per_post,
+                      comments_per_post=args.comments_per_post,
+                      dictionary_terms=args.dictionary_terms, max_paragraphs=args.max_paragraphs)
+    if args.size_mb:
+        scale = scale_for_size(args.size_mb, tables, args.seed, scale)
+
+    counts = write_dump(args.output, scale, tables, args.seed)
+    for table, count in counts.items():
+        print(f"  {WP_PREFIX}{table:20} {count:>9} rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Regression checks for run_batches' bisection of failed batches
+
+Usage:
+    python -m pytest sullysblog/scripts/test_supabase_writer.py
+    python sullysblog/scripts/test_supabase_writer.py
+"""
+
+from supabase_writer import run_batches
+
+
+def fake_send(bad, error="value too long for type character varying(200)"):
+    """A send that rejects any batch containing a row listed in `bad`"""
+    def send(batch):
+        if any(row['i'] in bad for row in batch):
+            raise Exception(error)
+        return batch
+    return send
+
+
+def write(send, count=16):
+    rows = [{'i': i} for i in range(count)]
+    return run_batches(send, 'posts', rows, max_workers=2, verbose=False)
+
+
+def failed_ids(result):
+    return sorted(row['i'] for row, _ in result.failed)
+
+
+def test_one_bad_row():
+    result = write(fake_send({5}))
+    assert (result.written, failed_ids(result)) == (15, [5])
+
+
+def test_two_bad_rows_in_different_halves():
+    result = write(fake_send({3, 12}))
+    assert (result.written, failed_ids(result)) == (14, [3, 12])
+
+
+def test_two_adjacent_bad_rows():
+    result = write(fake_send({1, 2}))
+    assert (result.written, failed_ids(result)) == (14, [1, 2])
+
+
+def test_whole_batch_error_is_not_bisected():
+    result = write(fake_send(set(range(16)), 'column "x" of relation "posts" does not exist'))
+    assert (result.written, len(result.failed), result.requests) == (0, 16, 1)
+
+
+if __name__ == '__main__':
+    for name, check in list(globals().items()):
+        if name.startswith('test_'):
+            check()
+            print(f"  ✓ {name}")
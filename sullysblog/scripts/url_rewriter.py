@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Rewrite many old -> new URLs in one pass over a text
+
+All old URLs are compiled into a single regular expression shaped like a
+trie (shared prefixes such as https://sullysblog.com/wp-content/uploads/ are
+matched once, then branch per character), and every match is replaced via a
+dict lookup. Each post body is scanned once no matter how many URLs there
+are, instead of once per URL.
+
+Where one old URL is a prefix of another, the longest match wins. Replaced
+text is never rescanned, so a new URL that contains an old one is left as
+is.
+
+Usage:
+    from url_rewriter import UrlRewriter
+
+    rewriter = UrlRewriter(url_mapping)
+    content, count = rewriter.rewrite(content)
+"""
+
+import re
+from typing import Dict, Iterable, Tuple
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """Regex source matching any of the words, longest first"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}   # end of a word
+    return _node_pattern(trie)
+
+
+def _node_pattern(node: dict) -> str:
+    branches = []
+    for char in sorted(key for key in node if key):
+        # Collapse single-child chains into one literal
+        prefix = char
+        child = node[char]
+        while len(child) == 1 and '' not in child:
+            (char, child), = child.items()
+            prefix += char
+        branches.append(re.escape(prefix) + _node_pattern(child))
+
+    if not branches:
+        return ''
+    if len(branches) == 1:
+        body = branches[0]
+        if '' in node:
+            return f"(?:{body})?"
+        return body
+
+    body = f"(?:{'|'.join(branches)})"
+    # Greedy optional: try the longer URL, fall back to the one ending here
+    return body + '?' if '' in node else body
+
+
+class UrlRewriter:
+    """Compiled old -> new URL mapping"""
+
+    def __init__(self, mapping: Dict[str, str]):
+        self.mapping = {old: new for old, new in mapping.items() if old and old != new}
+        self.pattern = re.compile(trie_pattern(self.mapping)) if self.mapping else None
+
+    def _replace(self, match) -> str:
+        return self.mapping[match.group(0)]
+
+    def rewrite(self, text: str) -> Tuple[str, int]:
+        """Return the rewritten text and the number of URLs replaced"""
+        if self.pattern is None or not text:
+            return text, 0
+        return self.pattern.subn(self._replace, text)
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Streaming tokenizer for WordPress mysqldump files
+
+Memory-maps backup.sql (falling back to fixed-size chunks) and yields
+(table, row) records for every INSERT statement, so memory stays flat
+regardless of the dump size. Rows are matched with compiled regexes over raw
+bytes rather than a per-character loop; quoted values are unescaped using
+MySQL rules, NULL becomes None and bare literals (numbers) are returned as
+their text. Values are decoded straight from the mapping, and only for the
+rows and columns a caller asks for (see Select).
+
+Usage:
+    from wp_sql_dump import WP_PREFIX, Select, iter_dump_rows, demux_dump
+
+    for table, row in iter_dump_rows('backup.sql', tables={f"{WP_PREFIX}posts"}):
+        ...
+
+    # Several tables in a single read of the dump
+    demux_dump('backup.sql', {'posts': posts.append, 'comments': comments.append})
+
+    # Only published posts, only the columns needed
+    select = {'posts': Select(columns=['ID', 'post_title'], where={'post_status': ['publish']})}
+    demux_dump('backup.sql', {'posts': posts.append}, select=select)
+"""
+
+import mmap
+import os
+import re
+from dataclasses import dataclass, field
+from typing import (Callable, Collection, Dict, Iterable, Iterator, List, Optional,
+                    Sequence, Tuple)
+
+# WordPress table prefix
+WP_PREFIX = "wp_5sn88nclkq_"
+
+# Tokenizer states
+SEEK = 0        # looking for the next INSERT statement
+EXPECT_ROW = 1  # expecting '(' to open a row
+IN_ROW = 2      # reading the values of a row
+AFTER_ROW = 3   # expecting ',' before the next row or ';'
+
+# Bytes read from the dump per chunk
+CHUNK_SIZE = 1024 * 1024
+
+# Statements the tokenizer cares about
+STATEMENT_RE = re.compile(rb"INSERT INTO `|CREATE TABLE `")
+LONGEST_PREFIX = len(b"CREATE TABLE `")
+
+# Longest INSERT header or CREATE TABLE statement we wait for
+MAX_HEADER = 64 * 1024
+
+HEADER_RE = re.compile(rb"INSERT INTO `([^`]+)`\s*(?:\(([^)]*)\)\s*)?VALUES\s*")
+
+# mysqldump writes one column definition per line and closes with "\n) ...;"
+CREATE_TABLE_RE = re.compile(rb"CREATE TABLE `([^`]+)` \((.*?)\n\)[^;\n]*;", re.DOTALL)
+COLUMN_RE = re.compile(rb"^\s*`([^`]+)`", re.MULTILINE)
+
+# Body of a quoted value: mysqldump single-quotes strings and escapes with
+# a backslash or a doubled quote. Written as an unrolled loop so it never
+# backtracks on long post bodies.
+STRING_BODY = rb"[^'\\]*(?:(?:\\.|'')[^'\\]*)*"
+
+ROW_OPEN_RE = re.compile(rb"\s*\(")
+
+# One value plus the ',' or ')' after it. Requiring the terminator means a
+# value cut off at the end of the buffer never matches, and strings are
+# matched whole so ')' or ';' inside post content cannot end a row.
+VALUE_RE = re.compile(
+    rb"\s*(?:'(" + STRING_BODY + rb")'|([^,'()\s][^,'()]*))\s*([,)])",
+    re.DOTALL,
+)
+
+# ',' before the next row or ';' at the end of the statement
+ROW_END_RE = re.compile(rb"\s*([,;])")
+
+COMMA = ord(',')
+CLOSE_PAREN = ord(')')
+
+# An escape sequence inside a quoted value: backslash + char, or a doubled
+# quote (a lone quote cannot occur inside STRING_BODY)
+UNESCAPE_RE = re.compile(rb"[\\'](.)", re.DOTALL)
+
+# MySQL backslash escapes; any other escaped character stands for itself
+ESCAPES = {bytes([i]): bytes([i]) for i in range(256)}
+ESCAPES.update({
+    b'0': b'\0',
+    b'b': b'\b',
+    b'n': b'\n',
+    b'r': b'\r',
+    b't': b'\t',
+    b'Z': b'\x1a',
+})
+
+
+def unescape(quoted: bytes) -> bytes:
+    """Resolve MySQL escapes in the body of a quoted value"""
+    # split() keeps the escaped characters at odd indexes; mapping them in
+    # one list comprehension is much cheaper than a re.sub callback per escape
+    parts = UNESCAPE_RE.split(quoted)
+    parts[1::2] = [ESCAPES[char] for char in parts[1::2]]
+    return b''.join(parts)
+
+
+def decode_span(value, view: Optional[memoryview] = None) -> Optional[str]:
+    """Decode a VALUE_RE match in place, without copying unescaped strings.
+
+    `view` is a memoryview of the buffer the match was made on; matches
+    kept from an earlier chunk fall back to a bytes slice.
+    """
+    buf = value.string
+    start, end = value.span(1)
+    if start == -1:
+        bare = buf[value.start(2):value.end(2)].strip()
+        return None if bare == b'NULL' else bare.decode('ascii', 'replace')
+    if buf.find(b'\\', start, end) != -1 or buf.find(b"''", start, end) != -1:
+        return unescape(buf[start:end]).decode('utf-8', 'replace')
+    if view is not None and view.obj is buf:
+        # Decode straight from the mapped file (or chunk) buffer
+        return str(view[start:end], 'utf-8', 'replace')
+    return buf[start:end].decode('utf-8', 'replace')
+
+
+@dataclass
+class Select:
+    """Column projection and filters for one table, by column name.
+
+    `columns` lists the columns to return, in order (default: all);
+    `where` maps a column to the values a row must have in it (NULL is
+    None). Names are resolved against the INSERT's column list or the
+    table's CREATE TABLE, falling back to `default_columns` for dumps that
+    have neither, and values are only decoded for rows that pass every
+    filter.
+    """
+    columns: Optional[Sequence[str]] = None
+    where: Dict[str, Collection[Optional[str]]] = field(default_factory=dict)
+    default_columns: Optional[Sequence[str]] = None
+
+    def key(self) -> str:
+        """Stable description, for cache file names"""
+        where = sorted((name, sorted(values, key=str)) for name, values in self.where.items())
+        return repr((
+            list(self.columns) if self.columns is not None else None,
+            where,
+            list(self.default_columns) if self.default_columns is not None else None,
+        ))
+
+    def resolve(self, table: str, names: Optional[List[str]]):
+        """Output column indexes and (index, accepted values) filters"""
+        if names is None:
+            raise ValueError(f"{table}: no CREATE TABLE or column list to resolve {self}")
+        index = {name: i for i, name in enumerate(names)}
+        missing = [name for name in list(self.columns or ()) + list(self.where) if name not in index]
+        if missing:
+            raise ValueError(f"{table} has no column {', '.join(missing)}")
+
+        output = [index[name] for name in self.columns] if self.columns is not None else None
+        filters = [(index[name], frozenset(values)) for name, values in self.where.items()]
+        return output, filters
+
+
+# Columns of wp_posts, used when the dump has no CREATE TABLE for it; rows
+# of any other width abort the parse
+POSTS_COLUMNS = [
+    'ID', 'post_author', 'post_date', 'post_date_gmt', 'post_content', 'post_title',
+    'post_excerpt', 'post_status', 'comment_status', 'ping_status', 'post_password',
+    'post_name', 'to_ping', 'pinged', 'post_modified', 'post_modified_gmt',
+    'post_content_filtered', 'post_parent', 'guid', 'menu_order', 'post_type',
+    'post_mime_type', 'comment_count',
+]
+
+# What migrate-posts.py reads from wp_posts: published posts and pages (not
+# revisions, attachments, etc.), projected to the columns it uses
+PUBLISHED_POSTS = Select(
+    columns=['ID', 'post_date', 'post_content', 'post_title', 'post_excerpt',
+             'post_name', 'post_modified', 'guid', 'post_type'],
+    where={'post_status': ['publish'], 'post_type': ['post', 'page']},
+    default_columns=POSTS_COLUMNS,
+)
+
+
+def _names(column_list: bytes) -> List[str]:
+    return [name.decode('utf-8') for name in re.findall(rb"`([^`]+)`", column_list)]
+
+
+def _map(f) -> Optional[mmap.mmap]:
+    """Read-only map of the file, or None where mapping is not possible"""
+    try:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+def iter_dump_rows(
+    sql_file: str,
+    tables: Optional[Iterable[str]] = None,
+    chunk_size: int = CHUNK_SIZE,
+    schema: Optional[Dict[str, List[str]]] = None,
+    expected_columns: Optional[Dict[str, int]] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+    select: Optional[Dict[str, Select]] = None,
+    use_mmap: bool = True,
+) -> Iterator[Tuple[str, tuple]]:
+    """Yield (table, row) for every INSERT row in the dump, in file order.
+
+    `tables` limits output to the given full table names; rows of other
+    tables are still tokenized (so quoted ';' cannot derail the parser) but
+    never decoded. `select` maps a table to a Select: rows failing its
+    filters are skipped before any of their values are decoded, and only
+    the projected columns are decoded and yielded.
+
+    Column names from CREATE TABLE statements are recorded in `schema` (pass
+    a dict to receive them). Every yielded row is checked against the
+    INSERT's column list, the table's CREATE TABLE or `expected_columns`,
+    and a row of the wrong width raises ValueError instead of being dropped.
+
+    `start` and `end` limit parsing to a byte range of the file; both must
+    fall on statement boundaries (see parallel_dump.split_ranges).
+
+    The file is memory-mapped and scanned in place; values are decoded
+    straight from the mapping. Files that cannot be mapped (or with
+    `use_mmap=False`) are read in `chunk_size` chunks instead.
+    """
+    wanted = set(tables) if tables is not None else None
+    schema = {} if schema is None else schema
+    expected_columns = expected_columns or {}
+    select = select or {}
+
+    state = SEEK
+    table = None
+    keep = False
+    output = None     # projected column indexes, None for all
+    filters = ()      # (index, accepted values) pairs
+    width = None
+    row = []
+
+    with open(sql_file, 'rb') as f:
+        mapped = _map(f) if use_mmap else None
+        if mapped is not None:
+            # The whole range is in view: no refills, no copies
+            buf = mapped
+            base = 0
+            pos = start
+            limit = len(mapped) if end is None else end
+            eof = True
+        else:
+            f.seek(start)
+            buf = b""
+            base = start      # file offset of buf[0], for error messages
+            pos = 0
+            limit = 0
+            eof = False
+            remaining = None if end is None else end - start
+        view = memoryview(buf)
+
+        try:
+            while True:
+                if state == IN_ROW:
+                    value = VALUE_RE.match(buf, pos, limit)
+                    if value:
+                        pos = value.end()
+                        if keep:
+                            # Decoded once the whole row is known
+                            row.append(value)
+                        if buf[pos - 1] == CLOSE_PAREN:
+                            if keep:
+                                if width is not None and len(row) != width:
+                                    raise ValueError(
+                                        f"{sql_file}: {table} row ending at byte {base + pos} "
+                                        f"has {len(row)} values, expected {width}"
+                                    )
+                                for index, accepted in filters:
+                                    if decode_span(row[index], view) not in accepted:
+                                        break
+                                else:
+                                    if output is None:
+                                        yield table, tuple([decode_span(v, view) for v in row])
+                                    else:
+                                        yield table, tuple([decode_span(row[i], view) for i in output])
+                            row = []
+                            state = AFTER_ROW
+                        continue
+
+                elif state == AFTER_ROW:
+                    sep = ROW_END_RE.match(buf, pos, limit)
+                    if sep:
+                        pos = sep.end()
+                        state = EXPECT_ROW if buf[pos - 1] == COMMA else SEEK
+                        continue
+
+                elif state == EXPECT_ROW:
+                    opened = ROW_OPEN_RE.match(buf, pos, limit)
+                    if opened:
+                        pos = opened.end()
+                        state = IN_ROW
+                        continue
+
+                else:
+                    found = STATEMENT_RE.search(buf, pos, limit)
+                    if found is None:
+                        if eof:
+                            return
+                        # Keep a tail in case a prefix straddles two chunks
+                        pos = max(pos, limit - LONGEST_PREFIX + 1)
+                    else:
+                        statement = found.start()
+                        if buf[statement] == ord('I'):
+                            header = HEADER_RE.match(buf, statement, limit)
+                            if header:
+                                table = header.group(1).decode('utf-8')
+                                keep = wanted is None or table in wanted
+                                if header.group(2) is not None:
+                                    names = _names(header.group(2))
+                                else:
+                                    names = schema.get(table)
+                                if names is None and keep and table in select:
+                                    names = select[table].default_columns
+                                width = len(names) if names is not None else expected_columns.get(table)
+                                output, filters = None, ()
+                                if keep and table in select:
+                                    output, filters = select[table].resolve(table, names)
+                                pos = header.end()
+                                state = EXPECT_ROW
+                                continue
+                        else:
+                            create = CREATE_TABLE_RE.match(buf, statement, limit)
+                            if create:
+                                names = COLUMN_RE.findall(create.group(2))
+                                schema[create.group(1).decode('utf-8')] = [
+                                    name.decode('utf-8') for name in names
+                                ]
+                                pos = create.end()
+                                continue
+                        if eof or limit - statement > MAX_HEADER:
+                            # Not a statement we understand, keep seeking
+                            pos = found.end()
+                            continue
+                        pos = statement
+
+                if eof:
+                    raise ValueError(f"{sql_file}: malformed or truncated INSERT for {table}")
+
+                # Need more input: drop consumed bytes and append the next chunk
+                if remaining is None:
+                    chunk = f.read(chunk_size)
+                else:
+                    chunk = f.read(min(chunk_size, remaining))
+                    remaining -= len(chunk)
+                if not chunk:
+                    eof = True
+                view.release()
+                buf = buf[pos:] + chunk
+                view = memoryview(buf)
+                base += pos
+                pos = 0
+                limit = len(buf)
+        finally:
+            view.release()
+            if mapped is not None:
+                mapped.close()
+
+
+def table_rows(
+    sql_file: str,
+    table_name: str,
+    chunk_size: int = CHUNK_SIZE,
+    expected_columns: Optional[int] = None,
+) -> Iterator[tuple]:
+    """Yield the rows of a single WordPress table (name without prefix)"""
+    full_table = f"{WP_PREFIX}{table_name}"
+    expected = {full_table: expected_columns} if expected_columns else None
+    for _, row in iter_dump_rows(sql_file, tables={full_table}, chunk_size=chunk_size,
+                                 expected_columns=expected):
+        yield row
+
+
+def demux_dump(
+    sql_file: str,
+    consumers: Dict[str, Callable[[tuple], None]],
+    chunk_size: int = CHUNK_SIZE,
+    expected_columns: Optional[Dict[str, int]] = None,
+    select: Optional[Dict[str, Select]] = None,
+) -> Dict[str, int]:
+    """Route rows of several WordPress tables to their consumers in one pass.
+
+    `consumers` maps table names (without prefix) to a callable that receives
+    each row of that table; `expected_columns` gives row widths (also keyed
+    without prefix) for dumps that lack CREATE TABLE statements, and
+    `select` an optional Select per table (filters and projection). Returns
+    the number of rows routed per table.
+    """
+    routes = {f"{WP_PREFIX}{name}": (name, consumer) for name, consumer in consumers.items()}
+    counts = {name: 0 for name in consumers}
+    expected = {f"{WP_PREFIX}{name}": count for name, count in (expected_columns or {}).items()}
+    selects = {f"{WP_PREFIX}{name}": query for name, query in (select or {}).items()}
+
+    for table, row in iter_dump_rows(sql_file, tables=routes.keys(), chunk_size=chunk_size,
+                                     expected_columns=expected, select=selects):
+        name, consumer = routes[table]
+        consumer(row)
+        counts[name] += 1
+
+    return counts
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Streaming reader for WordPress WXR (XML export) files
+
+Uses lxml.etree.iterparse to handle one <item> at a time and clears each
+finished element (and the siblings before it), so peak memory stays bounded
+no matter how large the export is. Items are turned into typed records:
+
+    Category    channel-level <wp:category>
+    Post        any <item> that is not an attachment (posts, pages, ...)
+    Attachment  <item> with post_type 'attachment'
+    Comment     <wp:comment> inside an item, yielded right after its Post
+
+A WxrIndex (attachment URLs, post thumbnails, post metadata and content
+image URLs) can be built in the same pass and is persisted next to the
+export, so the featured-image, content-image and XML-post migrations share
+it without reparsing.
+
+Usage:
+    from wxr_reader import Post, iter_wxr, load_index
+
+    for record in iter_wxr(XML_PATH):
+        if isinstance(record, Post) and record.post_type == 'post':
+            ...
+
+    index = load_index(XML_PATH)   # from disk unless the export changed
+"""
+
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional, Union
+
+from lxml import etree as ET
+
+from dump_cache import default_cache_dir, dump_checksum
+
+# WordPress XML namespaces
+NAMESPACES = {
+    'wp': 'http://wordpress.org/export/1.2/',
+    'content': 'http://purl.org/rss/1.0/modules/content/',
+    'excerpt': 'http://wordpress.org/export/1.2/excerpt/',
+    'dc': 'http://purl.org/dc/elements/1.1/'
+}
+
+CATEGORY_TAG = f"{{{NAMESPACES['wp']}}}category"
+
+# Bump when the index layout changes so stale files are rebuilt
+INDEX_VERSION = 1
+
+# Images embedded in post content
+IMG_PATTERN = re.compile(r'src="(https://sullysblog\.com/wp-content/uploads/[^"]+)"')
+
+
+@dataclass
+class Category:
+    term_id: str
+    name: str
+    slug: str
+
+
+@dataclass
+class Post:
+    post_id: str
+    post_type: str
+    status: Optional[str]
+    title: str
+    slug: Optional[str]
+    content: str
+    excerpt: str
+    post_date_gmt: Optional[str]
+    category_name: Optional[str] = None
+    category_slug: Optional[str] = None
+    postmeta: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def thumbnail_id(self) -> Optional[str]:
+        return self.postmeta.get('_thumbnail_id')
+
+
+@dataclass
+class Attachment:
+    post_id: str
+    url: Optional[str]
+    parent_id: Optional[str] = None
+
+
+@dataclass
+class Comment:
+    comment_id: str
+    post_id: str
+    author_name: Optional[str]
+    author_email: Optional[str]
+    content: Optional[str]
+    date_gmt: Optional[str]
+    approved: Optional[str]
+    parent_id: Optional[str]
+
+
+Record = Union[Category, Post, Attachment, Comment]
+
+
+def _text(elem, path: str) -> Optional[str]:
+    found = elem.find(path, NAMESPACES)
+    return found.text if found is not None else None
+
+
+def _release(elem):
+    """Free a processed element and everything parsed before it"""
+    elem.clear(keep_tail=True)
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
+def _item_records(item) -> Iterator[Record]:
+    post_id = _text(item, 'wp:post_id')
+    if post_id is None:
+        return
+
+    post_type = _text(item, 'wp:post_type')
+    if post_type == 'attachment':
+        yield Attachment(
+            post_id=post_id,
+            url=_text(item, 'wp:attachment_url'),
+            parent_id=_text(item, 'wp:post_parent'),
+        )
+        return
+
+    category = item.find('category[@domain="category"]')
+    postmeta = {}
+    for meta in item.findall('wp:postmeta', NAMESPACES):
+        key = _text(meta, 'wp:meta_key')
+        if key is not None and key not in postmeta:
+            postmeta[key] = _text(meta, 'wp:meta_value')
+
+    yield Post(
+        post_id=post_id,
+        post_type=post_type,
+        status=_text(item, 'wp:status'),
+        title=_text(item, 'title') or '',
+        slug=_text(item, 'wp:post_name'),
+        content=_text(item, 'content:encoded') or '',
+        excerpt=_text(item, 'excerpt:encoded') or '',
+        post_date_gmt=_text(item, 'wp:post_date_gmt'),
+        category_name=category.text if category is not None else None,
+        category_slug=category.get('nicename') if category is not None else None,
+        postmeta=postmeta,
+    )
+
+    for comment in item.findall('wp:comment', NAMESPACES):
+        yield Comment(
+            comment_id=_text(comment, 'wp:comment_id'),
+            post_id=post_id,
+            author_name=_text(comment, 'wp:comment_author'),
+            author_email=_text(comment, 'wp:comment_author_email'),
+            content=_text(comment, 'wp:comment_content'),
+            date_gmt=_text(comment, 'wp:comment_date_gmt'),
+            approved=_text(comment, 'wp:comment_approved'),
+            parent_id=_text(comment, 'wp:comment_parent'),
+        )
+
+
+def iter_wxr(xml_path: str) -> Iterator[Record]:
+    """Yield typed records from a WXR export, one <item> at a time"""
+    # recover mode handles the malformed markup WordPress exports contain
+    context = ET.iterparse(
+        xml_path,
+        events=('end',),
+        tag=('item', CATEGORY_TAG),
+        recover=True,
+        huge_tree=True,
+    )
+
+    for _, elem in context:
+        if elem.tag == CATEGORY_TAG:
+            yield Category(
+                term_id=_text(elem, 'wp:term_id'),
+                name=_text(elem, 'wp:cat_name'),
+                slug=_text(elem, 'wp:category_nicename'),
+            )
+        else:
+            yield from _item_records(elem)
+        _release(elem)
+
+    del context
+
+
+@dataclass
+class WxrIndex:
+    """Lookup tables gathered from one pass over a WXR export"""
+    attachments: Dict[str, str] = field(default_factory=dict)   # attachment id -> url
+    thumbnails: Dict[str, str] = field(default_factory=dict)    # post id -> _thumbnail_id
+    posts: Dict[str, dict] = field(default_factory=dict)        # post id -> metadata
+
+    def add(self, record: Record):
+        """Update the index from a record yielded by iter_wxr"""
+        if isinstance(record, Attachment):
+            if record.url:
+                self.attachments[record.post_id] = record.url
+        elif isinstance(record, Post):
+            if record.thumbnail_id:
+                self.thumbnails[record.post_id] = record.thumbnail_id
+            self.posts[record.post_id] = {
+                'post_type': record.post_type,
+                'status': record.status,
+                'slug': record.slug,
+                'title': record.title,
+                'post_date_gmt': record.post_date_gmt,
+                'image_urls': sorted(set(IMG_PATTERN.findall(record.content))),
+            }
+
+    def content_image_urls(self, post_type: str = 'post',
+                           statuses=('publish', 'future')) -> List[str]:
+        """Unique image URLs in the content of published posts of a type"""
+        urls = set()
+        for post in self.posts.values():
+            if post['post_type'] == post_type and post['status'] in statuses:
+                urls.update(post['image_urls'])
+        return sorted(urls)
+
+
+def index_path(xml_path: str) -> str:
+    """Where the index for this exact export is stored"""
+    checksum = dump_checksum(xml_path)
+    return os.path.join(
+        default_cache_dir(xml_path),
+        f"{checksum[:16]}-wxr-index-v{INDEX_VERSION}.json",
+    )
+
+
+def save_index(xml_path: str, index: WxrIndex):
+    """Persist an index built while iterating the export"""
+    path = index_path(xml_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(asdict(index), f, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_index(xml_path: str) -> WxrIndex:
+    """Load the export's index from disk, building it in one pass if missing"""
+    path = index_path(xml_path)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            print(f"Loaded WXR index from {path}")
+            return WxrIndex(**json.load(f))
+
+    print(f"Indexing {xml_path}...")
+    index = WxrIndex()
+    for record in iter_wxr(xml_path):
+        index.add(record)
+    save_index(xml_path, index)
+    return index